@@ -2,21 +2,204 @@
 Example partial implementation showing one method working.
 
 Copy this into generated_code/api.py to see the wrapper in action.
+
+MemoryUserStorage is fully annotated so the module can be compiled with
+mypyc (`pip install mypy && mypyc api.py`) when storage lookups, not
+bcrypt, dominate. The compiled module is a drop-in replacement.
 """
 
+import asyncio
+import operator
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, KeysView, List, Optional, Tuple, cast
+
 import bcrypt
 import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON encoding at the edge
+    orjson = None  # type: ignore[assignment]
+
+try:
+    from argon2 import PasswordHasher  # type: ignore[import-not-found]
+    from argon2.exceptions import VerificationError, InvalidHashError  # type: ignore[import-not-found]
+except ImportError:  # optional: only needed for password_scheme="argon2id"
+    PasswordHasher = None  # type: ignore[assignment,misc]
+
+
+DEFAULT_BCRYPT_COST = 12
+MIN_BCRYPT_COST = 4
+
+PASSWORD_SCHEMES = ("bcrypt", "argon2id")
+
+# Response templates. Handlers return dict(...) copies so callers can
+# still mutate what they get back without touching the shared template.
+_SUCCESS = {"success": True}
+_ERR_CREDENTIALS_REQUIRED = {"success": False, "error": "Email and password are required"}
+_ERR_INVALID_EMAIL = {"success": False, "error": "Email address is invalid"}
+_ERR_EMAIL_EXISTS = {"success": False, "error": "Email already exists"}
+_ERR_USER_NOT_FOUND = {"success": False, "error": "User not found"}
+_ERR_UPDATE_FAILED = {"success": False, "error": "Failed to update user"}
+
+_public_fields = operator.itemgetter("id", "email")
+
+# Domain labels exclude '.', so every dot has exactly one way to match and
+# the backtracking engine stays linear on hostile input.
+_EMAIL_RE = re.compile(r"[^@\s]+@[^@\s.]+(?:\.[^@\s.]+)+")
+
+
+def _dumps(response: dict) -> bytes:
+    """Serialize a response to JSON bytes, via orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(response)
+    return json.dumps(response, separators=(",", ":")).encode("utf-8")
+
+
+def _user_response(user_id: int, email: str) -> dict:
+    """Build a success response exposing only the public user fields."""
+    return {"success": True, "user": {"id": user_id, "email": email}}
+
+
+def _prehash(password: str) -> bytes:
+    """
+    SHA-256 the password and hex-encode it before bcrypt.
+
+    bcrypt silently truncates input at 72 bytes; the 64-byte hex digest
+    always fits and never contains NUL bytes.
+    """
+    return hashlib.sha256(password.encode('utf-8')).hexdigest().encode('ascii')
+
+
+def _hash_password(password: bytes, cost: int, salt: Optional[bytes] = None) -> bytes:
+    """Hash a password with bcrypt. Module-level so process pools can pickle it."""
+    if salt is None:
+        salt = bcrypt.gensalt(rounds=cost)
+    return bcrypt.hashpw(password, salt)
+
+
+def _argon2_hash(hasher: "PasswordHasher", password: str) -> bytes:
+    """Hash a password with Argon2id. Module-level so process pools can pickle it."""
+    return hasher.hash(password).encode('ascii')
+
+
+def make_argon2_hasher() -> "PasswordHasher":
+    """
+    Argon2id hasher with the parameters used for password_scheme="argon2id".
+    
+    Tune time_cost so a hash takes ~250ms on production hardware.
+    """
+    if PasswordHasher is None:
+        raise ImportError("argon2-cffi is required for Argon2id: pip install argon2-cffi")
+    return PasswordHasher(time_cost=3, memory_cost=65536, parallelism=4)
+
+
+def make_hash_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Create a process pool for bcrypt hashing, one worker per core by default."""
+    return ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+
+
+class _SaltPool:
+    """
+    Keeps a small queue of fresh bcrypt salts topped up from a daemon thread.
+    
+    Each salt is handed out exactly once. The pool only moves the
+    os.urandom call off the signup path; salts are never reused.
+    """
+    
+    def __init__(self, cost: int, size: int):
+        self._cost = cost
+        self._queue: "queue.Queue[bytes]" = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._filler = threading.Thread(target=self._fill, name="bcrypt-salt-pool", daemon=True)
+        self._filler.start()
+    
+    def _fill(self) -> None:
+        while not self._stop.is_set():
+            self._queue.put(bcrypt.gensalt(rounds=self._cost))
+    
+    def get(self) -> bytes:
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            # Pool drained by a burst; don't wait on the filler thread
+            return bcrypt.gensalt(rounds=self._cost)
+    
+    def close(self) -> None:
+        """Stop the filler thread and wait for it to exit."""
+        self._stop.set()
+        # Free a slot so a filler blocked on a full queue can finish its put
+        # and see the stop flag; it puts at most once more after this.
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._filler.join()
+
+
+class _EmailBloomFilter:
+    """
+    Two-probe bloom filter used as a negative prefilter for email lookups.
+    
+    A bytearray serves as the bit array so no extra dependency is needed.
+    Both probes come from the string's own (cached) hash. Deletes don't
+    clear bits, so they only add false positives, which the exact set
+    lookup behind the filter resolves.
+    """
+    
+    def __init__(self, size_bits: int = 1 << 20) -> None:
+        self._mask: int = size_bits - 1
+        self._bits: bytearray = bytearray(size_bits >> 3)
+    
+    def clear(self) -> None:
+        self._bits[:] = bytes(len(self._bits))
+    
+    def _probes(self, email: str) -> Tuple[int, int]:
+        h = hash(email)
+        return h & self._mask, (h >> 20) & self._mask
+    
+    def add(self, email: str) -> None:
+        for bit in self._probes(email):
+            self._bits[bit >> 3] |= 1 << (bit & 7)
+    
+    def might_contain(self, email: str) -> bool:
+        for bit in self._probes(email):
+            if not self._bits[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
 
 
 class MemoryUserStorage:
     """
     In-memory storage for users.
+    
+    Users are kept as parallel lists (struct-of-arrays) rather than one
+    dict per user. Rows are reached through two indexes: id -> row and
+    email -> row. The email index doubles as the duplicate check, so
+    there is no separate email set to keep in sync. Deletes swap the
+    last row into the freed slot so the lists stay dense. Any other
+    fields set through update_user live in a sparse per-user dict.
     """
     
-    def __init__(self):
-        self.users = {}  # Store users: id -> user_data
-        self.next_id = 1
-        self.emails = set()  # Track emails for duplicate checking
+    # Below this many users a plain dict lookup beats the bloom prefilter
+    BLOOM_MIN_USERS = 1000
+    
+    def __init__(self) -> None:
+        self._id_to_idx: Dict[int, int] = {}  # user id -> row index
+        self._email_to_idx: Dict[str, int] = {}  # email -> row index
+        self._ids: List[int] = []
+        self._emails: List[str] = []
+        self._hashes: List[str] = []
+        self._extra: Dict[int, Dict[str, Any]] = {}  # user id -> other fields
+        self.next_id: int = 1
+        self._email_bloom = _EmailBloomFilter()
     
     def create_user(self, email: str, password_hash: str) -> int:
         """
@@ -29,36 +212,78 @@ class MemoryUserStorage:
         Returns:
             User ID
         """
+        # One shared string object for the row, the index and responses
+        email = sys.intern(email)
         user_id = self.next_id
         self.next_id += 1
-        self.users[user_id] = {
-            "id": user_id,
-            "email": email,
-            "password_hash": password_hash
-        }
-        self.emails.add(email)
+        idx = len(self._ids)
+        self._id_to_idx[user_id] = idx
+        self._email_to_idx[email] = idx
+        self._ids.append(user_id)
+        self._emails.append(email)
+        self._hashes.append(password_hash)
+        self._email_bloom.add(email)
         return user_id
     
-    def get_user(self, user_id: int) -> dict:
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """
         Get user by ID.
         
+        Returns:
+            User dict or None if not found. The dict is a fresh copy;
+            use update_user to change stored fields.
+        """
+        idx = self._id_to_idx.get(user_id)
+        if idx is None:
+            return None
+        return self._row(idx)
+    
+    def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """
+        Get user by email.
+        
         Returns:
             User dict or None if not found
         """
-        return self.users.get(user_id)
+        idx = self._email_to_idx.get(email)
+        if idx is None:
+            return None
+        return self._row(idx)
+    
+    def _row(self, idx: int) -> Dict[str, Any]:
+        row = {
+            "id": self._ids[idx],
+            "email": self._emails[idx],
+            "password_hash": self._hashes[idx]
+        }
+        extra = self._extra.get(self._ids[idx])
+        if extra:
+            row.update(extra)
+        return row
     
-    def update_user(self, user_id: int, updates: dict) -> bool:
+    def update_user(self, user_id: int, updates: Dict[str, Any]) -> bool:
         """
         Update user fields.
         
         Returns:
             True if updated, False if not found
         """
-        if user_id in self.users:
-            self.users[user_id].update(updates)
-            return True
-        return False
+        idx = self._id_to_idx.get(user_id)
+        if idx is None:
+            return False
+        if "email" in updates:
+            # Re-key the email index to the new address
+            new_email = sys.intern(updates["email"])
+            del self._email_to_idx[self._emails[idx]]
+            self._email_to_idx[new_email] = idx
+            self._email_bloom.add(new_email)
+            self._emails[idx] = new_email
+        if "password_hash" in updates:
+            self._hashes[idx] = updates["password_hash"]
+        other = {key: value for key, value in updates.items() if key not in ("email", "password_hash")}
+        if other:
+            self._extra.setdefault(user_id, {}).update(other)
+        return True
     
     def delete_user(self, user_id: int) -> bool:
         """
@@ -67,25 +292,103 @@ class MemoryUserStorage:
         Returns:
             True if deleted, False if not found
         """
-        if user_id in self.users:
-            user = self.users[user_id]
-            self.emails.remove(user["email"])
-            del self.users[user_id]
-            return True
-        return False
+        idx = self._id_to_idx.pop(user_id, None)
+        if idx is None:
+            return False
+        
+        del self._email_to_idx[self._emails[idx]]
+        self._extra.pop(user_id, None)
+        
+        # Move the last row into the freed slot, then drop the tail
+        last = len(self._ids) - 1
+        if idx != last:
+            moved_id = self._ids[last]
+            moved_email = self._emails[last]
+            self._ids[idx] = moved_id
+            self._emails[idx] = moved_email
+            self._hashes[idx] = self._hashes[last]
+            self._id_to_idx[moved_id] = idx
+            self._email_to_idx[moved_email] = idx
+        self._ids.pop()
+        self._emails.pop()
+        self._hashes.pop()
+        return True
+    
+    def clear(self) -> None:
+        """Remove all users and reset ID allocation."""
+        self._id_to_idx.clear()
+        self._email_to_idx.clear()
+        self._ids.clear()
+        self._emails.clear()
+        self._hashes.clear()
+        self._extra.clear()
+        self._email_bloom.clear()
+        self.next_id = 1
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    @property
+    def emails(self) -> KeysView[str]:
+        """Live, set-like view of the emails in use."""
+        return self._email_to_idx.keys()
     
     def email_exists(self, email: str) -> bool:
         """Check if email is already in use."""
-        return email in self.emails
+        if len(self._ids) >= self.BLOOM_MIN_USERS and not self._email_bloom.might_contain(email):
+            return False
+        return email in self._email_to_idx
 
 
 class UserAPI:
     """
     User management API.
+
+    Passwords are stored as bcrypt(hex(sha256(password))), so passwords
+    longer than bcrypt's 72-byte limit are not truncated.
     """
     
-    def __init__(self, storage: MemoryUserStorage):
+    def __init__(
+        self,
+        storage: MemoryUserStorage,
+        bcrypt_cost: int = DEFAULT_BCRYPT_COST,
+        hash_executor: Optional[Executor] = None,
+        salt_pool_size: int = 0,
+        password_scheme: str = "bcrypt"
+    ):
+        """
+        Args:
+            storage: Backing user storage
+            bcrypt_cost: bcrypt work factor (log2 rounds). Keep 12+ in
+                production; tests can drop to the minimum of 4.
+            hash_executor: Optional executor (see make_hash_pool) to run
+                bcrypt on, so concurrent signups spread across cores.
+                The caller owns it and is responsible for shutting it down.
+            salt_pool_size: If > 0, pre-generate up to this many salts on a
+                background thread to keep salt generation off the signup path.
+                Call close() when done with the API to stop that thread.
+            password_scheme: "bcrypt" (default) or "argon2id" (needs
+                argon2-cffi). Argon2id is memory-hard, so attackers gain far
+                less from GPUs at the same server-side cost. Stored hashes of
+                either scheme keep verifying, so switching needs no migration.
+        """
+        if bcrypt_cost < MIN_BCRYPT_COST:
+            raise ValueError(f"bcrypt_cost must be >= {MIN_BCRYPT_COST}")
+        if password_scheme not in PASSWORD_SCHEMES:
+            raise ValueError(f"password_scheme must be one of {PASSWORD_SCHEMES}")
         self.storage = storage
+        self._cost = bcrypt_cost
+        self._executor = hash_executor
+        self._salt_pool = _SaltPool(bcrypt_cost, salt_pool_size) if salt_pool_size > 0 else None
+        self._scheme = password_scheme
+        self._argon2 = make_argon2_hasher() if password_scheme == "argon2id" else None
+        self._dummy: Optional[str] = None
+    
+    def close(self) -> None:
+        """Stop the salt pool's filler thread. The hash executor is left to its owner."""
+        if self._salt_pool is not None:
+            self._salt_pool.close()
+            self._salt_pool = None
     
     def create_user(self, email: str, password: str) -> dict:
         """
@@ -104,39 +407,115 @@ class UserAPI:
                 "error": "Error message"
             }
         """
+        error = self._validate_new_user(email, password)
+        if error is not None:
+            return error
+        
+        # Hash password
+        hash_fn, args = self._hash_job(password)
+        if self._executor is not None:
+            hashed = self._executor.submit(hash_fn, *args).result()
+        else:
+            hashed = hash_fn(*args)
+        
+        return self._store_new_user(email, hashed.decode('utf-8'))
+    
+    def bulk_create_users(self, users: List[Tuple[str, str]]) -> List[dict]:
+        """
+        Create many users at once, e.g. for seeding or imports.
+        
+        Validation and duplicate checks run first, including duplicates
+        within the batch, where the first occurrence wins. The surviving
+        passwords are then hashed together, in parallel when a
+        hash_executor is configured, and stored in a single pass.
+        
+        Returns:
+            One create_user-style response per input pair, in order
+        """
+        responses: List[Optional[dict]] = [None] * len(users)
+        accepted: List[Tuple[int, str]] = []
+        batch_emails = set()
+        
+        for i, (email, password) in enumerate(users):
+            error = self._validate_new_user(email, password)
+            if error is None and email in batch_emails:
+                error = dict(_ERR_EMAIL_EXISTS)
+            if error is not None:
+                responses[i] = error
+                continue
+            batch_emails.add(email)
+            accepted.append((i, email))
+        
+        jobs = [self._hash_job(users[i][1]) for i, _ in accepted]
+        if self._executor is not None:
+            futures = [self._executor.submit(fn, *args) for fn, args in jobs]
+            hashes = [future.result() for future in futures]
+        else:
+            hashes = [fn(*args) for fn, args in jobs]
+        
+        for (i, email), hashed in zip(accepted, hashes):
+            responses[i] = self._store_new_user(email, hashed.decode('utf-8'))
+        
+        # Every slot is now either an error or a stored user
+        return cast(List[dict], responses)
+    
+    def create_user_json(self, email: str, password: str) -> bytes:
+        """create_user, serialized to JSON bytes ready to send as the HTTP body."""
+        return _dumps(self.create_user(email, password))
+    
+    async def create_user_async(self, email: str, password: str) -> dict:
+        """
+        Async variant of create_user that hashes on the executor so the
+        event loop stays free while the password hash runs.
+        """
+        error = self._validate_new_user(email, password)
+        if error is not None:
+            return error
+        
+        loop = asyncio.get_running_loop()
+        hash_fn, args = self._hash_job(password)
+        hashed = await loop.run_in_executor(self._executor, hash_fn, *args)
+        
+        # Another signup may have claimed the email while we were hashing
+        error = self._validate_new_user(email, password)
+        if error is not None:
+            return error
+        
+        return self._store_new_user(email, hashed.decode('utf-8'))
+    
+    def _hash_job(self, password: str) -> Tuple[Callable[..., bytes], tuple]:
+        """Picklable hash function and arguments for the configured scheme."""
+        if self._argon2 is not None:
+            # Argon2 has no input length limit, so no SHA-256 pre-hash
+            return _argon2_hash, (self._argon2, password)
+        return _hash_password, (_prehash(password), self._cost, self._next_salt())
+    
+    def _next_salt(self) -> Optional[bytes]:
+        """Salt from the pool, or None to let the hasher generate one."""
+        return self._salt_pool.get() if self._salt_pool is not None else None
+    
+    def _validate_new_user(self, email: str, password: str) -> Optional[dict]:
+        """Return an error response if the user can't be created, else None."""
         # Input validation
         if not email or not password:
-            return {
-                "success": False,
-                "error": "Email and password are required"
-            }
+            return dict(_ERR_CREDENTIALS_REQUIRED)
+        
+        if not isinstance(email, str) or not _EMAIL_RE.fullmatch(email):
+            return dict(_ERR_INVALID_EMAIL)
         
         # Check for duplicate email
         if self.storage.email_exists(email):
-            return {
-                "success": False,
-                "error": "Email already exists"
-            }
-        
-        # Hash password
-        password_hash = bcrypt.hashpw(
-            password.encode('utf-8'),
-            bcrypt.gensalt()
-        ).decode('utf-8')
+            return dict(_ERR_EMAIL_EXISTS)
         
+        return None
+    
+    def _store_new_user(self, email: str, password_hash: str) -> dict:
+        """Persist a user whose password is already hashed."""
         # Create user
         user_id = self.storage.create_user(email, password_hash)
         
-        user = self.storage.get_user(user_id)
-        
-        return {
-            "success": True,
-            "user": {
-                "id": user["id"],
-                "email": user["email"]
-                # Don't include password_hash in response!
-            }
-        }
+        # Everything the response needs is already at hand
+        return _user_response(user_id, email)
     
     def get_user(self, user_id: int) -> dict:
         """
@@ -158,19 +537,14 @@ class UserAPI:
         user = self.storage.get_user(user_id)
         
         if user is None:
-            return {
-                "success": False,
-                "error": "User not found"
-            }
+            return dict(_ERR_USER_NOT_FOUND)
         
         # Return user without password
-        return {
-            "success": True,
-            "user": {
-                "id": user["id"],
-                "email": user["email"]
-            }
-        }
+        return _user_response(*_public_fields(user))
+    
+    def get_user_json(self, user_id: int) -> bytes:
+        """get_user, serialized to JSON bytes ready to send as the HTTP body."""
+        return _dumps(self.get_user(user_id))
     
     def update_user(self, user_id: int, updates: dict) -> dict:
         """
@@ -190,34 +564,23 @@ class UserAPI:
         user = self.storage.get_user(user_id)
         
         if user is None:
-            return {
-                "success": False,
-                "error": "User not found"
-            }
+            return dict(_ERR_USER_NOT_FOUND)
+        
+        if "email" in updates and not (
+            isinstance(updates["email"], str) and _EMAIL_RE.fullmatch(updates["email"])
+        ):
+            return dict(_ERR_INVALID_EMAIL)
         
         # If updating email, check for duplicates (excluding current user)
         if "email" in updates and updates["email"] != user["email"]:
             if self.storage.email_exists(updates["email"]):
-                return {
-                    "success": False,
-                    "error": "Email already exists"
-                }
+                return dict(_ERR_EMAIL_EXISTS)
         
         # Update user
         if self.storage.update_user(user_id, updates):
-            updated_user = self.storage.get_user(user_id)
-            return {
-                "success": True,
-                "user": {
-                    "id": updated_user["id"],
-                    "email": updated_user["email"]
-                }
-            }
+            return _user_response(user_id, updates.get("email", user["email"]))
         
-        return {
-            "success": False,
-            "error": "Failed to update user"
-        }
+        return dict(_ERR_UPDATE_FAILED)
     
     def delete_user(self, user_id: int) -> dict:
         """
@@ -234,14 +597,62 @@ class UserAPI:
             }
         """
         if self.storage.delete_user(user_id):
-            return {
-                "success": True
-            }
+            return dict(_SUCCESS)
         
-        return {
-            "success": False,
-            "error": "User not found"
-        }
+        return dict(_ERR_USER_NOT_FOUND)
+    
+    def verify_password(self, user_id: int, password: str) -> bool:
+        """
+        Check a password against the stored hash.
+        
+        The scheme is picked from the stored hash, so bcrypt and Argon2id
+        hashes both verify. Both libraries compare in constant time.
+        Unknown users are checked against a dummy hash of the configured
+        scheme and cost, so response time doesn't reveal whether the
+        user exists.
+        """
+        user = self.storage.get_user(user_id)
+        
+        if user is None:
+            self._check_hash(self._dummy_hash(), password)
+            return False
+        
+        return self._check_hash(user["password_hash"], password)
+    
+    def _check_hash(self, stored: str, password: str) -> bool:
+        if stored.startswith("$argon2"):
+            hasher = self._argon2 or make_argon2_hasher()
+            try:
+                return hasher.verify(stored, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        return bcrypt.checkpw(_prehash(password), stored.encode('utf-8'))
+    
+    def _dummy_hash(self) -> str:
+        """Hash used to equalize timing for users that don't exist."""
+        if self._dummy is None:
+            hash_fn, args = self._hash_job("dummy-password")
+            self._dummy = hash_fn(*args).decode('ascii')
+        return self._dummy
+
+
+def calibrate_bcrypt_cost(target_ms: float = 250.0, max_cost: int = 16) -> int:
+    """
+    Pick the lowest bcrypt cost whose hash time reaches target_ms.
+
+    Use a high target (~250ms) for production and a low one (~30ms)
+    for dev/test environments.
+    """
+    password = b"calibration-password"
+
+    for cost in range(MIN_BCRYPT_COST, max_cost + 1):
+        start = time.perf_counter()
+        _hash_password(password, cost)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if elapsed_ms >= target_ms:
+            return cost
+
+    return max_cost
 
 
 # For testing
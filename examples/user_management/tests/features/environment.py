@@ -0,0 +1,71 @@
+import functools
+import importlib.util
+from pathlib import Path
+
+_API_PATH = Path(__file__).parent.parent.parent / "generated_code" / "api.py"
+
+# Minimum bcrypt cost keeps hashing from dominating scenario time
+BCRYPT_COST = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _load_api():
+    """Load generated_code/api.py by path, once, regardless of cwd or sys.path."""
+    if not _API_PATH.exists():
+        return None
+    spec = importlib.util.spec_from_file_location("generated_api", _API_PATH)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except ImportError:
+        return None
+    return module
+
+
+def _new_api(module):
+    try:
+        return module.UserAPI(module.MemoryUserStorage(), bcrypt_cost=BCRYPT_COST)
+    except TypeError:
+        # The spec only requires UserAPI(storage); bcrypt_cost is optional
+        return module.UserAPI(module.MemoryUserStorage())
+
+
+def before_all(context):
+    """Build one UserAPI for the whole run."""
+    context.api = None
+    context.api_error = None
+    module = _load_api()
+    if module is None:
+        print("WARNING: API module not found. Implementation needed.")
+        context.api_error = "API module not found. Implementation needed."
+        return
+    context.api_module = module
+    try:
+        context.api = _new_api(module)
+    except Exception as e:
+        # Reported by every scenario, so a broken implementation can't pass
+        context.api_error = f"Could not create UserAPI: {e!r}"
+
+
+def before_scenario(context, scenario):
+    """Start every scenario with an empty database and fresh step state."""
+    if context.api is None:
+        raise RuntimeError(context.api_error)
+    context.response = None
+    context.created_user_id = None
+    storage = context.api.storage
+    if hasattr(storage, "clear"):
+        storage.clear()
+    else:
+        # Implementation has no clear(); fall back to a fresh instance
+        close = getattr(context.api, "close", None)
+        if callable(close):
+            close()
+        context.api = _new_api(context.api_module)
+
+
+def after_all(context):
+    """Let the API stop any background threads it started."""
+    close = getattr(getattr(context, "api", None), "close", None)
+    if callable(close):
+        close()
@@ -0,0 +1,82 @@
+"""
+Behave formatter that writes one JSON object per scenario.
+
+Each line is a single-scenario feature in behave's JSON layout:
+
+    {"name": <feature>, "elements": [<scenario with its steps>]}
+
+so a reader can parse the results a line at a time instead of loading
+one large array, and the existing feature-level parsing applies as is.
+
+Use with:
+    behave --format=spec_driven.wrappers._ndjson_formatter:NDJsonFormatter
+"""
+
+import json
+
+from behave.formatter.base import Formatter
+
+
+def _status_name(status) -> str:
+    """behave >= 1.2.6 uses a Status enum; older versions use strings."""
+    return getattr(status, "name", status) or ""
+
+
+class NDJsonFormatter(Formatter):
+    """Emit each scenario as a JSON line once its steps have run."""
+
+    name = "ndjson"
+    description = "One JSON object per scenario"
+
+    def __init__(self, stream_opener, config):
+        super().__init__(stream_opener, config)
+        self.stream = self.open()
+        self._feature_name = None
+        self._scenario = None
+
+    def feature(self, feature):
+        self._feature_name = feature.name
+
+    def scenario(self, scenario):
+        # A scenario is finished once the next one starts
+        self._write_scenario()
+        self._scenario = scenario
+
+    def eof(self):
+        self._write_scenario()
+
+    def _write_scenario(self):
+        scenario = self._scenario
+        if scenario is None:
+            return
+        self._scenario = None
+
+        steps = []
+        # all_steps includes Background steps, which can fail too
+        for step in scenario.all_steps:
+            result = {"status": _status_name(step.status)}
+            # behave 1.3 marks steps that raised an exception as "error"
+            if step.error_message and result["status"] in ("failed", "error"):
+                result["error_message"] = step.error_message
+            steps.append({
+                "keyword": step.keyword,
+                "name": step.name,
+                "result": result
+            })
+
+        element = {
+            "name": scenario.name,
+            "status": _status_name(scenario.status),
+            "steps": steps
+        }
+        # A failing before/after_scenario hook leaves its message on the scenario
+        if element["status"] == "hook_error" and scenario.error_message:
+            element["error_message"] = scenario.error_message
+
+        record = {
+            "name": self._feature_name,
+            "elements": [element]
+        }
+        self.stream.write(json.dumps(record, separators=(",", ":")))
+        self.stream.write("\n")
+        self.stream.flush()
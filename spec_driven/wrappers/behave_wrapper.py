@@ -7,12 +7,205 @@ Agent sees behavioral feedback, not implementation details.
 """
 
 import subprocess
+import contextlib
+import hashlib
+import io
 import json
+import logging
+import os
+import re
+import selectors
+import signal
+import threading
+import time
+from collections import deque
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional
 import sys
 
+try:
+    import orjson
+except ImportError:  # optional: faster JSON for large behave results
+    orjson = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+# Bytes of behave stdout/stderr kept per stream; older output is dropped
+MAX_OUTPUT_BYTES = 4 * 1024 * 1024
+
+
+class _BoundedBuffer:
+    """Keeps the most recent max_bytes of a byte stream."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.size = 0
+
+    def append(self, chunk: bytes):
+        self.chunks.append(chunk)
+        self.size += len(chunk)
+        while self.size - len(self.chunks[0]) >= self.max_bytes:
+            self.size -= len(self.chunks.popleft())
+
+    def text(self) -> str:
+        return b"".join(self.chunks)[-self.max_bytes:].decode("utf-8", errors="replace")
+
+
+class _BehaveTimeout(BaseException):
+    """
+    Raised by the SIGALRM handler to stop an in-process behave run.
+
+    A BaseException, so behave's step and hook runners, which catch
+    Exception, can't swallow it as an ordinary step error.
+    """
+
+
+def _raise_timeout(signum, frame):
+    """SIGALRM handler that makes an in-process behave run time out like a subprocess."""
+    raise _BehaveTimeout()
+
+
+def _run_with_bounded_output(cmd: List[str], timeout: float, env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+    """
+    Run cmd, draining stdout and stderr as they are produced.
+
+    Each stream keeps only its last MAX_OUTPUT_BYTES, so a very noisy
+    suite can't balloon memory. Pipes are read with os.read, which never
+    waits for a full line, so the timeout holds even if the process
+    hangs mid-line. On timeout the process is killed and
+    subprocess.TimeoutExpired raised, like subprocess.run.
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    buffers = {
+        process.stdout: _BoundedBuffer(MAX_OUTPUT_BYTES),
+        process.stderr: _BoundedBuffer(MAX_OUTPUT_BYTES),
+    }
+    deadline = time.monotonic() + timeout
+
+    with selectors.DefaultSelector() as selector:
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                process.kill()
+                process.wait()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+            for key, _ in selector.select(timeout=remaining):
+                chunk = os.read(key.fd, 65536)
+                if chunk:
+                    buffers[key.fileobj].append(chunk)
+                else:
+                    selector.unregister(key.fileobj)
+
+    returncode = process.wait()
+    process.stdout.close()
+    process.stderr.close()
+    return subprocess.CompletedProcess(
+        cmd,
+        returncode,
+        stdout=buffers[process.stdout].text(),
+        stderr=buffers[process.stderr].text()
+    )
+
+
+# Parts of error text that change between otherwise identical runs:
+# memory addresses, line numbers and directory prefixes of file paths
+VOLATILE_ERROR_DETAILS = re.compile(r"0x[0-9a-fA-F]+|(?<=line )\d+|(?<=:)\d+|(?:[\w.-]*/)+(?=[\w.-]+)")
+
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Failures the fallback summary describes as well as the LLM would
+# (missing code rather than wrong behavior), so Ollama can be skipped
+FAST_PATH_ERRORS = re.compile(
+    r"NotImplementedError|ModuleNotFoundError|ImportError|AttributeError.*has no attribute",
+    re.MULTILINE
+)
+IMPORT_ERRORS = re.compile(r"ModuleNotFoundError|ImportError")
+
+# Writes one scenario per line; see _ndjson_formatter
+NDJSON_FORMATTER = "spec_driven.wrappers._ndjson_formatter:NDJsonFormatter"
+# Directory containing the spec_driven package, so behave can import the formatter
+PACKAGE_ROOT = str(Path(__file__).resolve().parents[2])
+
+# behave's end-of-run line, e.g. "3 scenarios passed, 0 failed, 1 skipped"
+SCENARIO_SUMMARY = re.compile(r"^(\d+) scenarios? passed, (\d+) failed, (\d+) skipped", re.MULTILINE)
+
+# Fallback categorization: (scenario patterns that must all match, error
+# pattern or None, category, message). The first matching rule wins.
+_CREATE = re.compile(r"create", re.IGNORECASE)
+FALLBACK_RULES = (
+    ((), IMPORT_ERRORS, "setup",
+     "the implementation could not be loaded, so none of its behavior could be checked."),
+    ((_CREATE,), re.compile(r"NotImplementedError"), "create_user",
+     "the create_user method is not implemented yet."),
+    ((_CREATE, re.compile(r"hash|password", re.IGNORECASE)), None, "authentication",
+     "passwords need to be hashed, not stored in plaintext."),
+    ((_CREATE, re.compile(r"duplicate", re.IGNORECASE)), None, "create_user",
+     "duplicate emails should be rejected."),
+    ((_CREATE,), None, "create_user",
+     "user creation has issues."),
+    ((re.compile(r"fetch|get", re.IGNORECASE),), None, "get_user",
+     "user retrieval is not working correctly."),
+    ((re.compile(r"update", re.IGNORECASE),), None, "update_user",
+     "user updates are not functioning."),
+    ((re.compile(r"delete", re.IGNORECASE),), None, "delete_user",
+     "user deletion has issues."),
+)
+FALLBACK_CATEGORIES = (
+    "create_user", "get_user", "update_user", "delete_user",
+    "authentication", "storage", "setup"
+)
+
+# Feedback is 1-3 sentences per failure, so this is a generous cap
+TOKENS_PER_FAILURE = 256
+MAX_PREDICT_TOKENS = 1024
+
+# How long Ollama keeps the model loaded after a request
+KEEP_ALIVE = "10m"
+
+OBFUSCATION_PROMPT_PREFIX = """You are translating test failures into behavioral feedback for an AI developer.
+
+Your job: Convert code-level failures into business/specification-level problems.
+- HIDE: File names, line numbers, function names, stack traces
+- SHOW: What behavior failed, what was expected vs. actual
+- BE CONCISE: Each failure should be 1-3 sentences
+- USE CLARITY: Focus on what the spec expects, not how it's implemented
+
+Examples translation:
+  ❌ "AssertionError at user_steps.py:42: expected password_hash != None\n     Actual: stored_password == 'secure123'"
+  ✅ "The password should be hashed before storage, but it appears to be stored in plaintext."
+
+  ❌ "KeyError: 'email' in api.py line 15"
+  ✅ "The user email field is missing from the user response."
+
+Here are the test failures to translate:
+
+"""
+
 
 class BDDObfuscationWrapper:
     """
@@ -28,12 +221,85 @@ class BDDObfuscationWrapper:
         code_dir: str = "generated_code",
         test_dir: str = "external_tests",
         ollama_url: str = "http://localhost:11434",
-        ollama_model: str = "llama3.1"
+        ollama_model: str = "llama3.1",
+        stream: bool = True,
+        on_token: Optional[Callable[[str], None]] = None,
+        cache_dir: Optional[str] = ".bdd_obfuscation_cache",
+        parallel: int = 1,
+        in_process: bool = False,
+        warmup: bool = True
     ):
         self.code_dir = Path(code_dir)
         self.test_dir = Path(test_dir)
         self.ollama_url = ollama_url
         self.ollama_model = ollama_model
+        # Streaming lets feedback appear as it is generated; turn it off
+        # for servers that only support single-shot responses
+        self.stream = stream
+        self.on_token = on_token
+        # Obfuscated feedback keyed by failure set; None disables caching
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        # Number of behave processes to shard feature files across
+        self.parallel = max(1, parallel)
+        # Run behave inside this interpreter when there is a single shard
+        self.in_process = in_process
+        self._session = self._create_session()
+        if warmup:
+            # Load the model while the tests run so the first real call
+            # doesn't pay for it
+            threading.Thread(target=self._warmup, daemon=True).start()
+
+    def _create_session(self) -> requests.Session:
+        """
+        HTTP session reused for every Ollama call, keeping the connection alive.
+
+        Retries cover connection failures only; a POST that reached the
+        server is not replayed.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=4,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    def _warmup(self):
+        """
+        Ask Ollama to load the model and keep it resident.
+
+        Uses its own request rather than the shared session, which is
+        not safe to use from two threads. Failures are ignored; the
+        real call reports them.
+        """
+        payload = {
+            "model": self.ollama_model,
+            "prompt": "",
+            "keep_alive": KEEP_ALIVE,
+            "options": {"num_predict": 1}
+        }
+        try:
+            requests.post(
+                f"{self.ollama_url}/api/generate",
+                data=_json_dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=(5, 60)
+            )
+        except requests.RequestException:
+            pass
+
+    def close(self):
+        """Close the pooled HTTP connections."""
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def run_tests_and_obfuscate(self) -> str:
         """
@@ -43,15 +309,19 @@ class BDDObfuscationWrapper:
         3. Obfuscate with Ollama
         4. Return feedback for agent
         """
-        print("🧪 Running BDD tests...")
+        logger.info("🧪 Running BDD tests...")
         raw_results = self._run_behave()
         
-        print(f"📊 Tests completed. Status: {raw_results['status']}")
+        logger.info(f"📊 Tests completed. Status: {raw_results['status']}")
         
         if raw_results['status'] == 'passed':
             return "✅ All tests passed! Implementation is correct."
+
+        if raw_results['status'] in ('timeout', 'error'):
+            # Nothing to obfuscate; behave's stderr stays in raw_results
+            return f"❌ The tests could not run to completion: {raw_results['error']}"
         
-        print("🔍 Obfuscating test failures with Ollama...")
+        logger.info("🔍 Obfuscating test failures with Ollama...")
         feedback = self._obfuscate_results(raw_results)
         
         return feedback
@@ -61,89 +331,227 @@ class BDDObfuscationWrapper:
         Run Behave and return structured results.
         Tests are run from agent cannot see the implementation.
         """
-        results_path = self.test_dir / "test_results.json"
-        
-        # Clean up previous results
-        if results_path.exists():
-            results_path.unlink()
-        
-        # Run behave against external tests directory
         # The tests import from generated_code, but the test files themselves
         # are in external_tests (which agent can't see)
+        features_dir = self.test_dir / "features"
+        shards = self._shard_features(features_dir)
+
+        if len(shards) > 1:
+            logger.info(f"  Running {len(shards)} behave shards in parallel...")
+        return self._run_behave_shards(shards)
+
+    def _shard_features(self, features_dir: Path) -> List[List[Path]]:
+        """
+        Split feature files into up to `parallel` contiguous groups.
+
+        Contiguous groups keep the merged results in file order.
+        """
+        if self.parallel <= 1:
+            return [[features_dir]]
+
+        feature_files = sorted(features_dir.glob("*.feature"))
+        n_shards = min(self.parallel, os.cpu_count() or 1, len(feature_files))
+        if n_shards <= 1:
+            return [[features_dir]]
+
+        size, extra = divmod(len(feature_files), n_shards)
+        shards = []
+        start = 0
+        for i in range(n_shards):
+            end = start + size + (1 if i < extra else 0)
+            shards.append(feature_files[start:end])
+            start = end
+        return shards
+
+    def _run_behave_shards(self, shards: List[List[Path]]) -> Dict[str, Any]:
+        """Run one behave process per shard and merge their results."""
+        if len(shards) == 1:
+            run_shard = self._run_behave_in_process if self.in_process else self._run_behave_shard
+            outputs = [run_shard(shards[0], self.test_dir / "test_results.ndjson")]
+        else:
+            # Threads are enough here: each one just waits on a subprocess
+            with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                outputs = list(pool.map(
+                    self._run_behave_shard,
+                    shards,
+                    [self.test_dir / f"test_results.{i}.ndjson" for i in range(len(shards))]
+                ))
+
+        if any(output is None for output in outputs):
+            return {
+                "status": "timeout",
+                "error": "Tests timed out after 30 seconds"
+            }
+
+        results_paths = [results_path for results_path, _ in outputs]
+        results = [result for _, result in outputs]
+        combined = subprocess.CompletedProcess(
+            args=[result.args for result in results],
+            returncode=max(result.returncode for result in results),
+            stdout="".join(result.stdout for result in results),
+            stderr="".join(result.stderr for result in results)
+        )
+
+        if combined.returncode == 0:
+            # Everything passed, so there are no failure details to read
+            return self._passed_results(combined)
+
+        parsed = self._parse_test_results(self._iter_features(results_paths), combined)
+        if not parsed["failures"]:
+            # behave failed without recording a failing scenario: a startup,
+            # import or before_all error. Never report that as a pass.
+            parsed["status"] = "error"
+            parsed["error"] = (
+                f"behave exited with code {combined.returncode} "
+                "without reporting any failing scenario"
+            )
+        return parsed
+
+    def _passed_results(self, command_result: subprocess.CompletedProcess) -> Dict[str, Any]:
+        """
+        Results for a clean behave run, without reading the JSON file.
+
+        Counts come from behave's summary lines on stdout, summed across
+        shards; they are None if the summary could not be found.
+        """
+        counts = [0, 0, 0]
+        found = False
+        for match in SCENARIO_SUMMARY.finditer(command_result.stdout):
+            found = True
+            for i in range(3):
+                counts[i] += int(match.group(i + 1))
+        passed, failed, skipped = counts if found else (None, None, None)
+        return {
+            "status": "passed",
+            "summary": {
+                "passed": passed,
+                "failed": failed,
+                "skipped": skipped,
+                "total": passed + failed + skipped if found else None
+            },
+            "failures": [],
+            "raw_output": command_result.stdout,
+            "stderr": command_result.stderr
+        }
+
+    def _run_behave_shard(self, paths: List[Path], results_path: Path):
+        """
+        Run behave on the given paths.
+
+        Returns:
+            (results_path, CompletedProcess), or None if behave timed out
+        """
+        # Clean up previous results
+        try:
+            results_path.unlink()
+        except FileNotFoundError:
+            pass
+
         cmd = [
             sys.executable, "-m", "behave",
-            str(self.test_dir / "features"),
-            "--format=json.pretty",
+            *[str(path) for path in paths],
+            f"--format={NDJSON_FORMATTER}",
             f"--outfile={results_path}"
         ]
-        
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_ROOT, env.get("PYTHONPATH")]))
+
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            result = _run_with_bounded_output(cmd, timeout=30, env=env)
         except subprocess.TimeoutExpired:
-            return {
-                "status": "timeout",
-                "error": "Tests timed out after 30 seconds"
-            }
-        
-        # Parse the JSON output
-        if results_path.exists():
-            with open(results_path, 'r') as f:
-                test_data = json.load(f)
-        else:
-            test_data = []
-        
-        return self._parse_test_results(test_data, result)
+            return None
+
+        return results_path, result
+
+    def _run_behave_in_process(self, paths: List[Path], results_path: Path):
+        """
+        Run behave through its Python API instead of a subprocess.
+
+        Saves interpreter startup and imports on every run. Modules loaded
+        by the tests are dropped afterwards so the next run imports the
+        current generated code rather than a stale copy.
 
-    def _parse_test_results(self, test_data: List[Dict], command_result: subprocess.CompletedProcess) -> Dict[str, Any]:
+        Returns:
+            (results_path, CompletedProcess), or None if behave timed out
+        """
+        from behave.configuration import Configuration
+        from behave.runner import Runner
+
+        try:
+            results_path.unlink()
+        except FileNotFoundError:
+            pass
+
+        args = [
+            *[str(path) for path in paths],
+            f"--format={NDJSON_FORMATTER}",
+            f"--outfile={results_path}"
+        ]
+        # behave imports the formatter by name, as the subprocess does via PYTHONPATH
+        if PACKAGE_ROOT not in sys.path:
+            sys.path.insert(0, PACKAGE_ROOT)
+
+        # SIGALRM is only available on POSIX, and only in the main thread
+        use_alarm = (
+            hasattr(signal, "SIGALRM")
+            and threading.current_thread() is threading.main_thread()
+        )
+        if use_alarm:
+            previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.alarm(30)
+
+        modules_before = set(sys.modules)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        try:
+            # The formatter binds sys.stdout when the configuration is built
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                failed = Runner(Configuration(command_args=args)).run()
+        except _BehaveTimeout:
+            return None
+        finally:
+            if use_alarm:
+                signal.alarm(0)
+                signal.signal(signal.SIGALRM, previous_handler)
+            for name in set(sys.modules) - modules_before:
+                del sys.modules[name]
+
+        result = subprocess.CompletedProcess(
+            args=["behave", *args],
+            returncode=1 if failed else 0,
+            stdout=stdout.getvalue()[-MAX_OUTPUT_BYTES:],
+            stderr=stderr.getvalue()[-MAX_OUTPUT_BYTES:]
+        )
+        return results_path, result
+
+    def _iter_features(self, results_paths: List[Path]) -> Iterator[Dict]:
+        """
+        Yield single-scenario features from NDJSON result files, in order.
+
+        Lines are parsed one at a time, so only one scenario is held in
+        memory at once.
+        """
+        for results_path in results_paths:
+            # behave writes no file if it fails before running anything
+            try:
+                f = open(results_path, "rb")
+            except FileNotFoundError:
+                continue
+            with f:
+                for line in f:
+                    if line.strip():
+                        yield _json_loads(line)
+
+    def _parse_test_results(self, test_data: Iterable[Dict], command_result: subprocess.CompletedProcess) -> Dict[str, Any]:
         """
         Parse Behave JSON output and extract failures.
         """
+        counts = {"passed": 0, "failed": 0, "skipped": 0}
         failures = []
-        passed = 0
-        failed = 0
-        skipped = 0
         
         for feature in test_data:
-            feature_name = feature.get("name", "Unknown Feature")
-            
-            for scenario in feature.get("elements", []):
-                scenario_name = scenario.get("name", "Unknown Scenario")
-                status = scenario.get("status", "unknown")
-                
-                if status == "passed":
-                    passed += 1
-                elif status in ("failed", "error"):
-                    failed += 1
-                    # Extract failure details
-                    failure_details = {
-                        "feature": feature_name,
-                        "scenario": scenario_name,
-                        "steps": [],
-                        "error": None
-                    }
-                    
-                    for step in scenario.get("steps", []):
-                        step_info = {
-                            "keyword": step.get("keyword", ""),
-                            "name": step.get("name", ""),
-                            "status": step.get("status", "")
-                        }
-                        if step.get("status") == "failed":
-                            error_match = step.get("match", {})
-                            if error_match:
-                                step_info["error_message"] = error_match.get("message", "")
-                                failure_details["error"] = error_match.get("message", "")
-                        failure_details["steps"].append(step_info)
-                    
-                    failures.append(failure_details)
-                elif status == "skipped":
-                    skipped += 1
+            self._accumulate_feature(feature, counts, failures)
         
+        passed, failed, skipped = counts["passed"], counts["failed"], counts["skipped"]
         return {
             "status": "passed" if failed == 0 else "failed",
             "summary": {
@@ -157,6 +565,50 @@ class BDDObfuscationWrapper:
             "stderr": command_result.stderr
         }
 
+    def _accumulate_feature(self, feature: Dict, counts: Dict[str, int], failures: List[Dict]) -> None:
+        """
+        Add one feature's scenario counts and failure details in place.
+
+        This runs once per scenario, so lookups are hoisted out of the
+        step loop and only failed steps look up their error message.
+        """
+        feature_name = feature.get("name", "Unknown Feature")
+        
+        for scenario in feature.get("elements", ()):
+            status = scenario.get("status", "unknown")
+            
+            if status == "passed" or status == "skipped":
+                counts[status] += 1
+            elif status == "failed" or status == "error" or status == "hook_error":
+                counts["failed"] += 1
+                # Extract failure details
+                steps = []
+                append_step = steps.append
+                error = None
+                
+                for step in scenario.get("steps", ()):
+                    # behave reports step status and errors under "result"
+                    step_result = step.get("result") or {}
+                    step_status = step_result.get("status", "")
+                    step_info = {
+                        "keyword": step.get("keyword", ""),
+                        "name": step.get("name", ""),
+                        "status": step_status
+                    }
+                    if step_status == "failed" or step_status == "error":
+                        error_message = step_result.get("error_message")
+                        if error_message:
+                            step_info["error_message"] = error = error_message
+                    append_step(step_info)
+                
+                failures.append({
+                    "feature": feature_name,
+                    "scenario": scenario.get("name", "Unknown Scenario"),
+                    "steps": steps,
+                    # Hook errors are reported on the scenario, not a step
+                    "error": error or scenario.get("error_message")
+                })
+
     def _obfuscate_results(self, raw_results: Dict[str, Any]) -> str:
         """
         Use Ollama LLM to translate code-level failures into behavioral feedback.
@@ -167,92 +619,223 @@ class BDDObfuscationWrapper:
         Not:
             "AssertionError at user_steps.py:42: stored_password != 'secure123'"
         """
+        if self._can_fast_path(raw_results["failures"]):
+            logger.info("  Failures are all missing-implementation errors; skipping Ollama")
+            return self._fallback_obfuscation(raw_results)
+
+        cache_key = self._cache_key(raw_results)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            logger.info("  Reusing feedback for an identical set of failures")
+            return self._clean_and_format_response(cached)
+
         prompt = self._build_obfuscation_prompt(raw_results)
 
         try:
-            print(f"  Calling {self.ollama_model} (this may take a moment)...")
-            response = self._call_ollama(prompt)
+            logger.info(f"  Calling {self.ollama_model} (this may take a moment)...")
+            response = self._call_ollama(prompt, len(raw_results["failures"]))
+            if self.stream and self.on_token:
+                self.on_token("\n")  # end the line of streamed tokens
             if not response.strip():
                 raise ValueError("Empty response from Ollama")
+            self._cache_set(cache_key, response)
             return self._clean_and_format_response(response)
         except Exception as e:
             # Fallback if Ollama fails
             error_msg = f"Failed to call Ollama: {e}"
-            print(f"⚠️  {error_msg}")
+            logger.warning(f"⚠️  {error_msg}")
             return self._fallback_obfuscation(raw_results)
 
-    def _build_obfuscation_prompt(self, results: Dict[str, Any]) -> str:
-        """Build a prompt that instructs the LLM to obfuscate technical details."""
-        prompt = """You are translating test failures into behavioral feedback for an AI developer.
-
-Your job: Convert code-level failures into business/specification-level problems.
-- HIDE: File names, line numbers, function names, stack traces
-- SHOW: What behavior failed, what was expected vs. actual
-- BE CONCISE: Each failure should be 1-3 sentences
-- USE CLARITY: Focus on what the spec expects, not how it's implemented
+    def _can_fast_path(self, failures: List[Dict]) -> bool:
+        """True if every failure is a missing-implementation error."""
+        return bool(failures) and all(
+            FAST_PATH_ERRORS.search(failure.get("error") or "") for failure in failures
+        )
 
-Examples translation:
-  ❌ "AssertionError at user_steps.py:42: expected password_hash != None\n     Actual: stored_password == 'secure123'"
-  ✅ "The password should be hashed before storage, but it appears to be stored in plaintext."
+    def _sorted_failures(self, results: Dict[str, Any]) -> List[Dict]:
+        """Failures ordered by (feature, scenario), independent of run order."""
+        return sorted(results["failures"], key=lambda f: (f["feature"], f["scenario"]))
 
-  ❌ "KeyError: 'email' in api.py line 15"
-  ✅ "The user email field is missing from the user response."
+    def _cache_key(self, results: Dict[str, Any]) -> str:
+        """
+        Content hash of the failure set, ignoring run-to-run noise.
 
-Here are the test failures to translate:
+        Line numbers, addresses and directory paths are masked so that an
+        agent editing unrelated code still gets a cache hit.
+        """
+        canonical = {
+            "model": self.ollama_model,
+            "failures": [
+                {
+                    "feature": failure["feature"],
+                    "scenario": failure["scenario"],
+                    "steps": [
+                        [step["keyword"], step["name"], step["status"],
+                         VOLATILE_ERROR_DETAILS.sub("", step.get("error_message") or "")]
+                        for step in failure["steps"]
+                    ],
+                    "error": VOLATILE_ERROR_DETAILS.sub("", failure["error"] or ""),
+                }
+                for failure in self._sorted_failures(results)
+            ],
+        }
+        encoded = json.dumps(canonical, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Return cached feedback for key, or None if missing or expired."""
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.txt"
+        try:
+            if time.time() - path.stat().st_mtime > CACHE_TTL_SECONDS:
+                return None
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _cache_set(self, key: str, feedback: str) -> None:
+        """Store feedback under key. Cache write failures are not fatal."""
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / f"{key}.txt").write_text(feedback, encoding="utf-8")
+        except OSError as e:
+            logger.warning(f"⚠️  Could not write obfuscation cache: {e}")
 
-"""
-        
-        for failure in results["failures"]:
-            prompt += f"\n📍 Feature: {failure['feature']}\n"
-            prompt += f"   Scenario: {failure['scenario']}\n"
-            
-            # Add details about the failure
-            if failure["error"]:
-                prompt += f"   Error: {failure['error']}\n"
-            
-            # Find the failing step
-            for step in failure["steps"]:
-                if step["status"] == "failed":
-                    prompt += f"   Failed Step: {step['keyword']} {step['name']}\n"
-                    if "error_message" in step:
-                        prompt += f"   Technical Error: {step['error_message']}\n"
-            
-            prompt += "\n"
+    def _build_obfuscation_prompt(self, results: Dict[str, Any]) -> str:
+        """Build a prompt that instructs the LLM to obfuscate technical details."""
+        # Static instructions first and failures in a stable order, so Ollama
+        # can reuse the cached prompt prefix between runs
+        parts = [OBFUSCATION_PROMPT_PREFIX]
+
+        # Scenarios failing with the same error are listed under it once,
+        # so a repeated import error doesn't inflate the prompt
+        groups: Dict[str, List[Dict]] = {}
+        for failure in self._sorted_failures(results):
+            groups.setdefault(failure["error"] or "", []).append(failure)
+
+        for error, group in groups.items():
+            if error:
+                count = f" (x{len(group)} scenarios)" if len(group) > 1 else ""
+                parts.append(f"\n📍 Error{count}: {error}\n")
+            else:
+                parts.append("\n📍 No error message\n")
+
+            for failure in group:
+                parts.append(f"   - Feature: {failure['feature']} / Scenario: {failure['scenario']}\n")
+
+                # Find the failing step
+                for step in failure["steps"]:
+                    if step["status"] in ("failed", "error"):
+                        parts.append(f"     Failed Step: {step['keyword']} {step['name']}\n")
+                        if step.get("error_message", error) != error:
+                            parts.append(f"     Technical Error: {step['error_message']}\n")
+
+            parts.append("\n")
         
-        prompt += """
+        parts.append("""
 Translate each failure into behavioral feedback. Format as a numbered list:
 1. [Behavior problem description]
 2. [Behavior problem description]
 
 Return ONLY the translated feedback, nothing else.
-"""
-        return prompt
+""")
+        return "".join(parts)
+
+    def _call_ollama(self, prompt: str, n_failures: int = 1) -> str:
+        """
+        Call Ollama API for obfuscation.
 
-    def _call_ollama(self, prompt: str) -> str:
-        """Call Ollama API for obfuscation."""
+        Generation is capped at ~256 tokens per failure (max 1024), and a
+        run of blank lines stops it once the numbered list is finished.
+        """
+        num_predict = min(TOKENS_PER_FAILURE * max(1, n_failures), MAX_PREDICT_TOKENS)
         payload = {
             "model": self.ollama_model,
             "prompt": prompt,
-            "stream": False,
+            "stream": self.stream,
+            "keep_alive": KEEP_ALIVE,
             "options": {
                 "temperature": 0.3,
-                "num_predict": 2000
+                "num_predict": num_predict,
+                "stop": ["\n\n\n"],
+                "num_ctx": self._context_size(prompt, num_predict)
             }
         }
         
-        response = requests.post(
+        if self.stream:
+            return self._call_ollama_streaming(payload)
+        
+        response = self._session.post(
             f"{self.ollama_url}/api/generate",
-            json=payload,
+            data=_json_dumps(payload),
+            headers={"Content-Type": "application/json"},
             timeout=20
         )
         
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
         
         # Handle different response formats (some models use "thinking" or "response")
         result = data.get("response", "") or data.get("thinking", "")
         return result
 
+    def _context_size(self, prompt: str, num_predict: int) -> int:
+        """
+        Smallest power-of-two context (min 2048) that fits prompt and output.
+
+        Asking for just enough context keeps Ollama from allocating a
+        larger KV cache than needed, without truncating long prompts.
+        Tokens are estimated at ~3 characters each, which errs large.
+        """
+        needed = len(prompt) // 3 + num_predict
+        num_ctx = 2048
+        while num_ctx < needed:
+            num_ctx *= 2
+        return num_ctx
+
+    def _call_ollama_streaming(self, payload: Dict[str, Any]) -> str:
+        """
+        Call Ollama with streaming enabled, collecting tokens as they arrive.
+
+        Ollama streams one JSON object per line. Each token is passed to
+        on_token (if set) so callers can show progress. The 20s read
+        timeout applies between chunks, not to the whole generation.
+        """
+        response_parts = []
+        thinking_parts = []
+
+        with self._session.post(
+            f"{self.ollama_url}/api/generate",
+            data=_json_dumps(payload),
+            headers={"Content-Type": "application/json"},
+            stream=True,
+            timeout=(5, 20)
+        ) as response:
+            response.raise_for_status()
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = _json_loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+
+                token = chunk.get("response", "")
+                if token:
+                    response_parts.append(token)
+                    if self.on_token:
+                        self.on_token(token)
+                thinking_parts.append(chunk.get("thinking", ""))
+
+                if chunk.get("done"):
+                    break
+
+        # Same fallback as the non-streaming path for "thinking" models
+        return "".join(response_parts) or "".join(thinking_parts)
+
     def _clean_and_format_response(self, response: str) -> str:
         """Clean up LLM response and format nicely."""
         # Remove markdown if present
@@ -276,43 +859,25 @@ Test Results: Implementation Needed
             f"Implementation issues detected ({results['summary']['failed']} test(s) failed)\n"
         ]
 
-        # Group by common patterns
-        patterns = {
-            "create_user": [],
-            "get_user": [],
-            "update_user": [],
-            "delete_user": [],
-            "authentication": [],
-            "storage": []
-        }
+        # Group by common patterns; dicts keep messages unique and ordered
+        patterns = {category: {} for category in FALLBACK_CATEGORIES}
 
         for failure in failures:
             scenario = failure['scenario']
-            error = failure.get("error", "")
-
-            # Try to categorize
-            if "create" in scenario.lower():
-                if "NotImplementedError" in str(error):
-                    patterns["create_user"].append("the create_user method is not implemented yet.")
-                elif "hash" in scenario.lower() or "password" in scenario.lower():
-                    patterns["authentication"].append("passwords need to be hashed, not stored in plaintext.")
-                elif "duplicate" in scenario.lower():
-                    patterns["create_user"].append("duplicate emails should be rejected.")
-                else:
-                    patterns["create_user"].append("user creation has issues.")
-            elif "fetch" in scenario.lower() or "get" in scenario.lower():
-                patterns["get_user"].append("user retrieval is not working correctly.")
-            elif "update" in scenario.lower():
-                patterns["update_user"].append("user updates are not functioning.")
-            elif "delete" in scenario.lower():
-                patterns["delete_user"].append("user deletion has issues.")
+            error = str(failure.get("error", ""))
+
+            for scenario_patterns, error_pattern, category, message in FALLBACK_RULES:
+                if error_pattern is not None and not error_pattern.search(error):
+                    continue
+                if all(pattern.search(scenario) for pattern in scenario_patterns):
+                    patterns[category][message] = None
+                    break
 
         # Build summary
         for category, messages in patterns.items():
             if messages:
-                unique_messages = list(set(messages))
                 summary.append(f"{category.upper()}:")
-                for msg in unique_messages:
+                for msg in messages:
                     summary.append(f"  - {msg}")
 
         return "\n".join(summary)
@@ -327,17 +892,29 @@ def main():
     parser.add_argument("--test-dir", default="external_tests", help="Directory containing BDD tests")
     parser.add_argument("--ollama-url", default="http://localhost:11434", help="Ollama API URL")
     parser.add_argument("--ollama-model", default="llama3.1", help="Ollama model to use")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the full Ollama response instead of streaming")
+    parser.add_argument("--cache-dir", default=".bdd_obfuscation_cache", help="Directory for cached obfuscation results")
+    parser.add_argument("--no-cache", action="store_true", help="Always call Ollama, ignoring cached results")
+    parser.add_argument("--parallel", type=int, default=1, help="Number of behave processes to shard feature files across")
+    parser.add_argument("--no-warmup", action="store_true", help="Don't preload the Ollama model while tests run")
+    parser.add_argument("--in-process", action="store_true", help="Run behave inside the wrapper instead of a subprocess")
     
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stdout)
     
-    wrapper = BDDObfuscationWrapper(
+    with BDDObfuscationWrapper(
         code_dir=args.code_dir,
         test_dir=args.test_dir,
         ollama_url=args.ollama_url,
-        ollama_model=args.ollama_model
-    )
-    
-    feedback = wrapper.run_tests_and_obfuscate()
+        ollama_model=args.ollama_model,
+        stream=not args.no_stream,
+        on_token=lambda token: print(token, end="", flush=True),
+        cache_dir=None if args.no_cache else args.cache_dir,
+        parallel=args.parallel,
+        in_process=args.in_process,
+        warmup=not args.no_warmup
+    ) as wrapper:
+        feedback = wrapper.run_tests_and_obfuscate()
     print(feedback)
     
     return 0
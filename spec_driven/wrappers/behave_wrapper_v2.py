@@ -17,12 +17,224 @@ The satisfaction score provides nuance beyond pass/fail:
 """
 
 import subprocess
+import bisect
+import contextlib
+import hashlib
+import io
 import json
+import os
+import re
+import signal
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Tuple
+from typing import Callable, Dict, List, Any, NamedTuple, Optional, Tuple
 import sys
 
+try:
+    import orjson
+except ImportError:  # optional: faster JSON for large behave results
+    orjson = None
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _json_dumps(obj: Any) -> bytes:
+    """Serialize to JSON bytes, with orjson when installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+class _BehaveTimeout(BaseException):
+    """
+    Raised by the SIGALRM handler to stop an in-process behave run.
+
+    A BaseException, so behave's step and hook runners, which catch
+    Exception, can't swallow it as an ordinary step error.
+    """
+
+
+def _raise_timeout(signum, frame):
+    """SIGALRM handler that makes an in-process behave run time out like a subprocess."""
+    raise _BehaveTimeout()
+
+
+def _is_behave_report(data: Any) -> bool:
+    """True if data looks like behave's JSON report: a list of features."""
+    return isinstance(data, list) and all(
+        isinstance(feature, dict) and "keyword" in feature for feature in data
+    )
+
+
+def _split_behave_json(stdout: bytes) -> Tuple[List[Dict], str]:
+    """
+    Separate behave's JSON report from anything else printed to stdout.
+
+    Output from environment hooks can appear around the report, which
+    starts on its own line with "[". Hook lines such as "[INFO] ..."
+    start the same way, so each such line is tried in turn until one
+    parses as a list of features. Returns ([], output) if there is no
+    report, e.g. when behave fails before running anything.
+    """
+    start = 0 if stdout.startswith(b"[") else stdout.find(b"\n[") + 1
+    while start > 0 or stdout.startswith(b"["):
+        before = stdout[:start].decode("utf-8", errors="replace")
+        report = stdout[start:]
+        try:
+            test_data, after = _json_loads(report), ""
+        except ValueError:
+            # Hook output after the report; decode up to the end of the JSON
+            text = report.decode("utf-8", errors="replace")
+            try:
+                test_data, end = json.JSONDecoder().raw_decode(text)
+                after = text[end:]
+            except ValueError:
+                test_data = None
+
+        if _is_behave_report(test_data):
+            return test_data, before + after
+
+        next_start = stdout.find(b"\n[", start + 1) + 1
+        if next_start == 0:
+            break
+        start = next_start
+
+    return [], stdout.decode("utf-8", errors="replace")
+
+
+# Parts of error text that change between otherwise identical runs:
+# memory addresses, line numbers and directory paths
+VOLATILE_ERROR_DETAILS = re.compile(r"0x[0-9a-fA-F]+|(?<=line )\d+|(?<=:)\d+|(?:[\w.-]*/)+(?=[\w.-]+)")
+
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Distinct failure groups shown in the prompt; the rest are summarised
+MAX_PROMPT_CLUSTERS = 8
+
+# Fallback categorization: (scenario patterns that must all match, error
+# pattern or None, category, message). The first matching rule wins.
+_CREATE = re.compile(r"create", re.IGNORECASE)
+FALLBACK_RULES = (
+    ((_CREATE,), re.compile(r"NotImplementedError"), "create_user",
+     "the create_user method is not implemented yet."),
+    ((_CREATE, re.compile(r"hash|password", re.IGNORECASE)), None, "create_user",
+     "passwords need to be hashed, not stored in plaintext."),
+    ((_CREATE, re.compile(r"duplicate", re.IGNORECASE)), None, "create_user",
+     "duplicate emails should be rejected."),
+    ((_CREATE,), None, "create_user",
+     "user creation has issues."),
+    ((re.compile(r"fetch|get", re.IGNORECASE),), None, "get_user",
+     "user retrieval is not working correctly."),
+    ((re.compile(r"update", re.IGNORECASE),), None, "update_user",
+     "user updates are not functioning."),
+    ((re.compile(r"delete", re.IGNORECASE),), None, "delete_user",
+     "user deletion has issues."),
+)
+FALLBACK_CATEGORIES = ("create_user", "get_user", "update_user", "delete_user")
+
+# Generation budget: each feedback item is 1-3 sentences and the score
+# is a one-line JSON object, so both caps leave generous headroom
+FEEDBACK_TOKENS_PER_ITEM = 80
+SCORE_TOKENS = 120
+
+# Pass rates that settle the score without asking the LLM
+CLEAR_PASS_RATE = 0.95
+CLEAR_FAIL_RATE = 0.05
+
+# Lower bounds of the score buckets, and (emoji, label) for each bucket
+SCORE_THRESHOLDS = (0.4, 0.7, 0.9)
+SCORE_BUCKETS = (("🔴", "Poor"), ("🟠", "Moderate"), ("🟡", "Good"), ("🟢", "Excellent"))
+
+# Score in a response that isn't valid JSON, e.g. 'Score: 0.7'
+SCORE_IN_TEXT = re.compile(r'score["\s:]+(\d+\.?\d*)', re.IGNORECASE)
+ASSERTION_ERROR = re.compile(r"assert", re.IGNORECASE)
+
+# Separates the feedback list from the score JSON in a combined response
+SCORE_DELIMITER = "---SCORE---"
+
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} span in text, or None if there isn't one.
+
+    Braces inside JSON strings are ignored, so reasoning text that
+    mentions "{" or "}" doesn't end the object early. Any prose the
+    model writes around the object is skipped.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def _score_complete(text: str) -> bool:
+    """True once a balanced JSON object follows SCORE_DELIMITER in text."""
+    start = text.find(SCORE_DELIMITER)
+    if start < 0:
+        return False
+    return _extract_json_object(text[start + len(SCORE_DELIMITER):]) is not None
+
+
+OBFUSCATION_PROMPT_PREFIX = """You are translating test failures into behavioral feedback for an AI developer.
+
+Your job: Convert code-level failures into business/specification-level problems.
+- HIDE: File names, line numbers, function names, stack traces
+- SHOW: What behavior failed, what was expected vs. actual
+- BE CONCISE: Each failure should be 1-3 sentences
+- USE CLARITY: Focus on what the spec expects, not how it's implemented
+
+Examples translation:
+  ❌ "AssertionError at user_steps.py:42: expected password_hash != None\n     Actual: stored_password == 'secure123'"
+  ✅ "The password should be hashed before storage, but it appears to be stored in plaintext."
+
+  ❌ "KeyError: 'email' in api.py line 15"
+  ✅ "The user email field is missing from the user response."
+
+Here are the test failures to translate:
+
+"""
+
+
+class FailureTrace(NamedTuple):
+    """Execution trace of one failed scenario, for LLM evaluation."""
+    feature: str
+    scenario: str
+    steps: List[Dict[str, str]]
+    failed_step: Optional[str]
+    error_type: Optional[str]
+    error_message: Optional[str]
+    file_location: Optional[str]
+
 
 class BDDObfuscationWrapperWithScoring:
     """
@@ -31,6 +243,8 @@ class BDDObfuscationWrapperWithScoring:
     Two-phase evaluation:
     1. Obfuscation: Translate technical errors to behavioral feedback
     2. Scoring: Evaluate overall behavioral satisfaction (0.0-1.0)
+
+    Both phases are answered by a single LLM call.
     """
 
     def __init__(
@@ -38,12 +252,59 @@ class BDDObfuscationWrapperWithScoring:
         code_dir: str = "generated_code",
         test_dir: str = "external_tests",
         ollama_url: str = "http://localhost:11434",
-        ollama_model: str = "llama3.1"
+        ollama_model: str = "llama3.1",
+        cache_dir: Optional[str] = ".bdd_obfuscation_cache",
+        stream: bool = True,
+        on_token: Optional[Callable[[str], None]] = None,
+        in_process: bool = False,
+        parallel: int = 1,
+        always_llm_score: bool = False
     ):
         self.code_dir = Path(code_dir)
         self.test_dir = Path(test_dir)
         self.ollama_url = ollama_url
         self.ollama_model = ollama_model
+        # Ollama responses keyed by model and prompt; None disables caching
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        # Streaming shows feedback as it is generated and stops generation
+        # once the score JSON is complete
+        self.stream = stream
+        self.on_token = on_token
+        # Run behave inside this interpreter when there is a single shard
+        self.in_process = in_process
+        # Number of behave processes to shard feature files across
+        self.parallel = max(1, parallel)
+        # Ask the LLM for a score even when the pass rate alone settles it
+        self.always_llm_score = always_llm_score
+        self._session = self._create_session()
+
+    def _create_session(self) -> requests.Session:
+        """
+        HTTP session reused for every Ollama call, keeping the connection alive.
+
+        Retries cover connection failures only; a POST that reached the
+        server is not replayed.
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=2,
+            max_retries=Retry(total=2, backoff_factor=0.1)
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    def close(self):
+        """Close the pooled HTTP connections."""
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def run_tests_with_scoring(self) -> str:
         """
@@ -55,6 +316,10 @@ class BDDObfuscationWrapperWithScoring:
         print("🧪 Running BDD tests...")
         raw_results = self._run_behave()
 
+        if raw_results['status'] in ('timeout', 'error'):
+            # Nothing to obfuscate or score; behave's stderr stays in raw_results
+            return f"❌ The tests could not run to completion: {raw_results['error']}"
+
         summary = raw_results['summary']
         print(f"📊 Tests completed: {summary['passed']} passed, {summary['failed']} failed, {summary['skipped']} skipped")
 
@@ -62,13 +327,9 @@ class BDDObfuscationWrapperWithScoring:
         if summary['failed'] == 0:
             return self._format_perfect_result(summary)
 
-        # Phase 1: Obfuscation - translate technical errors to behavioral feedback
-        print("🔍 Phase 1: Obfuscating test failures with LLM...")
-        behavioral_feedback = self._obfuscate_results(raw_results)
-
-        # Phase 2: Scoring - evaluate satisfaction (0.0-1.0)
-        print("📈 Phase 2: Evaluating satisfaction score...")
-        satisfaction_score, satisfaction_reasoning = self._evaluate_satisfaction(raw_results, behavioral_feedback)
+        # Both phases share one LLM call, so the failures are only prefilled once
+        print("🔍 Obfuscating test failures and evaluating satisfaction with LLM...")
+        behavioral_feedback, satisfaction_score, satisfaction_reasoning = self._obfuscate_and_score(raw_results)
 
         # Combine into formatted output
         return self._format_scored_result(
@@ -80,41 +341,136 @@ class BDDObfuscationWrapperWithScoring:
 
     def _run_behave(self) -> Dict[str, Any]:
         """Run Behave and return structured results with traces."""
-        results_path = self.test_dir / "test_results.json"
-
-        # Clean up previous results
-        if results_path.exists():
-            results_path.unlink()
-
-        # Run behave
-        cmd = [
-            sys.executable, "-m", "behave",
-            str(self.test_dir / "features"),
-            "--format=json.pretty",
-            f"--outfile={results_path}"
-        ]
+        shards = self._shard_features(self.test_dir / "features")
+        if len(shards) > 1:
+            print(f"  Running {len(shards)} behave shards in parallel...")
 
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            if len(shards) == 1:
+                run_shard = self._run_behave_in_process if self.in_process else self._run_behave_shard
+                results = [run_shard(self._behave_args(shards[0]))]
+            else:
+                # Threads are enough here: each one just waits on a subprocess
+                with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+                    results = list(pool.map(self._run_behave_shard, map(self._behave_args, shards)))
         except subprocess.TimeoutExpired:
             return {
                 "status": "timeout",
                 "error": "Tests timed out after 30 seconds"
             }
 
-        # Parse the JSON output
-        if results_path.exists():
-            with open(results_path, 'r') as f:
-                test_data = json.load(f)
-        else:
-            test_data = []
+        test_data = []
+        other_output = []
+        for result in results:
+            features, output = _split_behave_json(result.stdout)
+            test_data.extend(features)
+            other_output.append(output)
+
+        combined = subprocess.CompletedProcess(
+            [result.args for result in results],
+            max(result.returncode for result in results),
+            stdout="".join(other_output),
+            stderr="".join(result.stderr.decode("utf-8", errors="replace") for result in results)
+        )
+
+        parsed = self._parse_test_results(test_data, combined)
+        if combined.returncode != 0 and not parsed["failures"]:
+            # behave failed without reporting a failing scenario: a startup,
+            # import or before_all error, or a report that couldn't be found.
+            # Never score that as a pass.
+            parsed["status"] = "error"
+            parsed["error"] = (
+                f"behave exited with code {combined.returncode} "
+                "without reporting any failing scenario"
+            )
+        return parsed
+
+    def _shard_features(self, features_dir: Path) -> List[List[Path]]:
+        """
+        Split feature files into up to `parallel` contiguous groups.
+
+        Contiguous groups keep the merged results in file order.
+        """
+        if self.parallel <= 1:
+            return [[features_dir]]
+
+        feature_files = sorted(features_dir.glob("*.feature"))
+        n_shards = min(self.parallel, os.cpu_count() or 1, len(feature_files))
+        if n_shards <= 1:
+            return [[features_dir]]
+
+        size, extra = divmod(len(feature_files), n_shards)
+        shards = []
+        start = 0
+        for i in range(n_shards):
+            end = start + size + (1 if i < extra else 0)
+            shards.append(feature_files[start:end])
+            start = end
+        return shards
+
+    def _behave_args(self, paths: List[Path]) -> List[str]:
+        """
+        Behave arguments for one shard.
 
-        return self._parse_test_results(test_data, result)
+        Compact JSON goes straight to stdout: no results file to write
+        and read back. --no-summary keeps behave's totals out of the JSON.
+        """
+        return [
+            *[str(path) for path in paths],
+            "--format=json",
+            "--no-summary"
+        ]
+
+    def _run_behave_shard(self, args: List[str]) -> subprocess.CompletedProcess:
+        """Run behave in a subprocess; raises subprocess.TimeoutExpired after 30s."""
+        return subprocess.run(
+            [sys.executable, "-m", "behave", *args],
+            capture_output=True,
+            timeout=30
+        )
+
+    def _run_behave_in_process(self, args: List[str]) -> subprocess.CompletedProcess:
+        """
+        Run behave through its Python API instead of a subprocess.
+
+        Saves interpreter startup and imports on every run. Modules loaded
+        by the tests are dropped afterwards so the next run imports the
+        current generated code rather than a stale copy. Output is
+        returned as bytes, like subprocess.run with capture_output.
+        """
+        from behave.configuration import Configuration
+        from behave.runner import Runner
+
+        # SIGALRM is only available on POSIX, and only in the main thread
+        use_alarm = (
+            hasattr(signal, "SIGALRM")
+            and threading.current_thread() is threading.main_thread()
+        )
+        if use_alarm:
+            previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, 30)
+
+        modules_before = set(sys.modules)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        try:
+            # The formatter binds sys.stdout when the configuration is built
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                failed = Runner(Configuration(command_args=args)).run()
+        except _BehaveTimeout:
+            raise subprocess.TimeoutExpired(["behave", *args], 30) from None
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous_handler)
+            for name in set(sys.modules) - modules_before:
+                del sys.modules[name]
+
+        return subprocess.CompletedProcess(
+            ["behave", *args],
+            1 if failed else 0,
+            stdout=stdout.getvalue().encode("utf-8"),
+            stderr=stderr.getvalue().encode("utf-8")
+        )
 
     def _parse_test_results(self, test_data: List[Dict], command_result: subprocess.CompletedProcess) -> Dict[str, Any]:
         """Parse Behave JSON output and extract failures with traces."""
@@ -132,7 +488,8 @@ class BDDObfuscationWrapperWithScoring:
 
                 if status == "passed":
                     passed += 1
-                elif status in ("failed", "error"):
+                elif status in ("failed", "error", "hook_error"):
+                    # A hook_error scenario never ran its steps, so it can't pass
                     failed += 1
 
                     # Collect "traces" - execution details for LLM evaluation
@@ -154,140 +511,191 @@ class BDDObfuscationWrapperWithScoring:
             "stderr": command_result.stderr
         }
 
-    def _collect_traces(self, scenario: Dict, feature_name: str, scenario_name: str) -> Dict:
+    def _collect_traces(self, scenario: Dict, feature_name: str, scenario_name: str) -> "FailureTrace":
         """
         Collect execution traces (the "trace" StrongDM refers to).
         These traces provide context for LLM evaluation.
         """
-        failure_details = {
-            "feature": feature_name,
-            "scenario": scenario_name,
-            "steps": [],
-            "traces": {
-                "failed_step": None,
-                "error_type": None,
-                "error_message": None,
-                "file_location": None,
-                "step_status": []
-            }
-        }
+        steps = []
+        failed_step = error_type = error_message = file_location = None
 
         for step in scenario.get("steps", []):
-            step_status = step.get("status", "")
-            step_info = {
+            # behave reports step status and errors under "result"
+            step_result = step.get("result") or {}
+            step_status = step_result.get("status", "")
+            steps.append({
                 "keyword": step.get("keyword", ""),
                 "name": step.get("name", ""),
                 "status": step_status
-            }
-            failure_details["steps"].append(step_info)
-            failure_details["traces"]["step_status"].append(step_status)
-
-            if step_status in ("failed", "error"):
-                error_match = step.get("match", {})
-                if error_match:
-                    failure_details["traces"]["failed_step"] = step.get("name", "")
-                    failure_details["traces"]["error_type"] = "AssertionError" if "assert" in str(error_match.get("message", "")).lower() else "RuntimeError"
-                    failure_details["traces"]["error_message"] = error_match.get("message", "")
-                    failure_details["traces"]["file_location"] = error_match.get("location", "")
+            })
+
+            if failed_step is None and step_status in ("failed", "error"):
+                error_message = step_result.get("error_message")
+                # json.pretty splits long messages into a list of lines
+                if isinstance(error_message, list):
+                    error_message = "\n".join(error_message)
+                failed_step = step.get("name", "")
+                error_type = "AssertionError" if ASSERTION_ERROR.search(str(error_message)) else "RuntimeError"
+                file_location = (step.get("match") or {}).get("location", "")
+
+        return FailureTrace(
+            feature_name, scenario_name, steps,
+            failed_step, error_type, error_message, file_location
+        )
 
-            if "error_message" in step:
-                failure_details["traces"]["error_message"] = step["error_message"]
+    def _obfuscate_and_score(self, raw_results: Dict[str, Any]) -> Tuple[str, float, str]:
+        """
+        Obfuscation and scoring in a single LLM call.
 
-        return failure_details
+        The model writes the behavioral feedback list, then SCORE_DELIMITER,
+        then the score JSON. When the pass rate alone settles the score,
+        only the feedback is requested. If the call fails, the feedback
+        falls back to the pattern summary; if the score is missing, to
+        the pass rate.
 
-    def _obfuscate_results(self, raw_results: Dict[str, Any]) -> str:
-        """
-        Phase 1: Obfuscation
-        Translate code-level failures into behavioral feedback.
+        Returns:
+            (behavioral_feedback, satisfaction_score, satisfaction_reasoning)
         """
-        prompt = self._build_obfuscation_prompt(raw_results)
+        # One feedback item per failure group shown, plus the summary line
+        # for any beyond the cap
+        n_items = min(len(self._cluster_failures(raw_results["failures"])), MAX_PROMPT_CLUSTERS + 1)
+        max_tokens = FEEDBACK_TOKENS_PER_ITEM * n_items
+
+        clear_cut = None if self.always_llm_score else self._clear_cut_score(raw_results["summary"])
+        if clear_cut is None:
+            prompt = self._build_combined_prompt(raw_results)
+            max_tokens += SCORE_TOKENS
+        else:
+            prompt = self._build_obfuscation_prompt(raw_results)
 
         try:
-            response = self._call_ollama(prompt)
-            return self._clean_and_format_response(response)
+            response = self._call_ollama(prompt, max_tokens)
+            if self.stream and self.on_token:
+                self.on_token("\n")  # end the line of streamed tokens
         except Exception as e:
-            print(f"⚠️  Obfuscation failed: {e}")
-            return self._fallback_obfuscation(raw_results)
+            print(f"⚠️  LLM evaluation failed: {e}")
+            score, reasoning = clear_cut or self._pass_rate_score(raw_results["summary"])
+            return self._fallback_obfuscation(raw_results), score, reasoning
+
+        feedback, delimiter, score_response = response.partition(SCORE_DELIMITER)
+        feedback = self._clean_and_format_response(feedback) or self._fallback_obfuscation(raw_results)
+        if clear_cut is not None:
+            score, reasoning = clear_cut
+        elif delimiter:
+            score, reasoning = self._parse_score_response(score_response.strip())
+        else:
+            score, reasoning = self._pass_rate_score(raw_results["summary"])
+        return feedback, score, reasoning
 
-    def _build_obfuscation_prompt(self, results: Dict[str, Any]) -> str:
-        """Build obfuscation prompt for behavioral translation."""
-        prompt = """You are translating test failures into behavioral feedback for an AI developer.
+    def _clear_cut_score(self, summary: Dict) -> Optional[Tuple[float, str]]:
+        """
+        The pass rate as the score when it leaves no room for judgement.
 
-Your job: Convert code-level failures into business/specification-level problems.
-- HIDE: File names, line numbers, function names, stack traces
-- SHOW: What behavior failed, what was expected vs. actual
-- BE CONCISE: Each failure should be 1-3 sentences
-- USE CLARITY: Focus on what the spec expects, not how it's implemented
+        At or above CLEAR_PASS_RATE the result is in the top bucket
+        whatever the failures are; at or below CLEAR_FAIL_RATE it is in
+        the bottom one. Returns None when the LLM should judge.
+        """
+        pass_rate = summary['passed'] / summary['total']
+        if pass_rate >= CLEAR_PASS_RATE:
+            return pass_rate, f"High pass rate ({pass_rate:.1%}); only isolated scenarios fail."
+        if pass_rate <= CLEAR_FAIL_RATE:
+            return pass_rate, f"Very low pass rate ({pass_rate:.1%}); core behavior is not working yet."
+        return None
+
+    def _failure_prompt_parts(self, results: Dict[str, Any]) -> List[str]:
+        """
+        Translation instructions followed by the failures to translate.
 
-Examples translation:
-  ❌ "AssertionError at user_steps.py:42: expected password_hash != None\n     Actual: stored_password == 'secure123'"
-  ✅ "The password should be hashed before storage, but it appears to be stored in plaintext."
+        Returned as a list of string pieces for the caller to extend and
+        join once, rather than growing one string per line.
+        """
+        # Static instructions first so Ollama can reuse the cached prompt
+        # prefix between runs
+        parts = [OBFUSCATION_PROMPT_PREFIX]
 
-  ❌ "KeyError: 'email' in api.py line 15"
-  ✅ "The user email field is missing from the user response."
+        clusters = self._cluster_failures(results["failures"])
+        for failure, count in clusters[:MAX_PROMPT_CLUSTERS]:
+            parts.append(f"\n📍 Feature: {failure.feature}\n")
+            parts.append(f"   Scenario: {failure.scenario}\n")
+            if count > 1:
+                parts.append(f"   (x{count} scenarios in this feature fail the same way)\n")
 
-Here are the test failures to translate:
+            if failure.error_message:
+                parts.append(f"   Error: {failure.error_message}\n")
 
-"""
+            if failure.failed_step:
+                parts.append(f"   Failed Step: {failure.failed_step}\n")
 
-        for failure in results["failures"]:
-            prompt += f"\n📍 Feature: {failure['feature']}\n"
-            prompt += f"   Scenario: {failure['scenario']}\n"
+            parts.append("\n")
 
-            if failure["traces"]["error_message"]:
-                prompt += f"   Error: {failure['traces']['error_message']}\n"
+        if len(clusters) > MAX_PROMPT_CLUSTERS:
+            remaining = sum(count for _, count in clusters[MAX_PROMPT_CLUSTERS:])
+            parts.append(f"... and {remaining} more failures with other errors\n\n")
 
-            if failure["traces"]["failed_step"]:
-                prompt += f"   Failed Step: {failure['traces']['failed_step']}\n"
+        return parts
 
-            prompt += "\n"
+    def _cluster_failures(self, failures: List[FailureTrace]) -> List[Tuple[FailureTrace, int]]:
+        """
+        Group failures by feature and error, ignoring run-to-run noise.
+
+        Returns (first failure, count) per group in order of first
+        appearance, so the prompt carries one example per distinct problem.
+        Failures without an error message are never grouped, since there
+        is nothing to tell them apart by.
+        """
+        clusters: Dict[Tuple, List] = {}
+        for i, failure in enumerate(failures):
+            error = VOLATILE_ERROR_DETAILS.sub("", failure.error_message or "")
+            signature = (failure.feature, error) if error else (failure.feature, None, i)
+            cluster = clusters.get(signature)
+            if cluster is None:
+                clusters[signature] = [failure, 1]
+            else:
+                cluster[1] += 1
+        return [(failure, count) for failure, count in clusters.values()]
 
-        prompt += """Translate each failure into behavioral feedback. Format as a numbered list:
+    def _build_obfuscation_prompt(self, results: Dict[str, Any]) -> str:
+        """Build a prompt for the behavioral feedback list only."""
+        parts = self._failure_prompt_parts(results)
+        parts.append("""Translate each failure into behavioral feedback. Format as a numbered list:
 1. [Behavior problem description]
 2. [Behavior problem description]
 
 Return ONLY the translated feedback, nothing else.
-"""
-        return prompt
+""")
+        return "".join(parts)
 
-    def _evaluate_satisfaction(self, raw_results: Dict, behavioral_feedback: str) -> Tuple[float, str]:
+    def _build_combined_prompt(self, results: Dict[str, Any]) -> str:
         """
-        Phase 2: Scoring
-        Evaluate satisfaction score (0.0-1.0) based on:
-        - Number of passed vs failed tests
-        - Severity of failures (from traces)
-        - Behavioral feedback from obfuscation phase
+        Build one prompt asking for the feedback list and the satisfaction score.
 
-        This is LLM-as-judge evaluation per StrongDM's model.
+        This is the LLM-as-judge evaluation per StrongDM's model, judged
+        from the same failure context the feedback is written from.
         """
-        summary = raw_results['summary']
-        total = summary['total']
-
-        if total == 0:
-            return 0.0, "No tests to evaluate"
+        summary = results['summary']
+        base_pass_rate = summary['passed'] / summary['total']
 
-        # Base score from pass rate
-        base_pass_rate = summary['passed'] / total if total > 0 else 0
+        parts = self._failure_prompt_parts(results)
+        parts.append(f"""Translate each failure into behavioral feedback. Format as a numbered list:
+1. [Behavior problem description]
+2. [Behavior problem description]
 
-        # Build prompt for LLM to refine score based on failure severity
-        prompt = f"""You are evaluating the behavioral satisfaction of a software implementation.
+Then write a line containing only {SCORE_DELIMITER} and evaluate the behavioral
+satisfaction of the implementation.
 
 Context:
-- Total scenarios: {total}
+- Total scenarios: {summary['total']}
 - Passed: {summary['passed']}
 - Failed: {summary['failed']}
 - Skipped: {summary['skipped']}
 
-Behavioral feedback from obfuscation phase:
-{behavioral_feedback}
-
 Evaluate the overall satisfaction score (0.0-1.0) considering:
 1. What percentage of scenarios passed? ({base_pass_rate:.1%})
 2. How severe are the failures? (critical bugs vs minor issues)
 3. Is the core functionality working? (partial usability vs broken)
 4. Are failures simple fixes or architectural problems?
 
-Return your response in this JSON format:
+After {SCORE_DELIMITER}, give the score in this JSON format:
 {{
   "score": 0.XX,
   "reasoning": "Brief explanation of why this score was given"
@@ -299,61 +707,157 @@ Consider:
 - 0.7-0.9: Mostly correct, minor issues (most tests passing, edge cases failing)
 - 0.9-1.0: Excellent, deployment-ready (minor or no issues)
 
-Return ONLY the JSON, nothing else.
-"""
+Return ONLY the feedback list, the {SCORE_DELIMITER} line and the JSON, nothing else.
+""")
+        return "".join(parts)
 
-        try:
-            response = self._call_ollama(prompt)
-            return self._parse_score_response(response)
-        except Exception as e:
-            print(f"⚠️  Scoring failed: {e}")
-            # Fallback: use pass rate as score
-            return base_pass_rate, f"Used pass rate ({base_pass_rate:.1%}) as fallback score"
+    def _pass_rate_score(self, summary: Dict) -> Tuple[float, str]:
+        """Fallback score when the LLM gives none: the scenario pass rate."""
+        base_pass_rate = summary['passed'] / summary['total'] if summary['total'] > 0 else 0
+        return base_pass_rate, f"Used pass rate ({base_pass_rate:.1%}) as fallback score"
 
     def _parse_score_response(self, response: str) -> Tuple[float, str]:
         """Parse LLM score response."""
-        try:
-            # Try to extract JSON from response
-            data = json.loads(response)
-            score = float(data.get("score", 0.0))
-            reasoning = data.get("reasoning", "No reasoning provided")
-            return score, reasoning
-        except json.JSONDecodeError:
-            # Try to extract score from text
-            import re
-            match = re.search(r'score["\s:]+(\d+\.?\d*)', response.lower())
-            if match:
-                score = float(match.group(1))
-                reasoning = response[:200]
+        # The JSON object may be wrapped in prose or a code fence
+        span = _extract_json_object(response)
+        if span is not None:
+            try:
+                data = json.loads(span)
+                score = float(data.get("score", 0.0))
+                reasoning = data.get("reasoning", "No reasoning provided")
                 return score, reasoning
+            except (ValueError, TypeError, AttributeError):
+                pass
+
+        # Try to extract score from text
+        match = SCORE_IN_TEXT.search(response)
+        if match:
+            score = float(match.group(1))
+            reasoning = response[:200]
+            return score, reasoning
 
         # Fallback
         return 0.0, "Failed to parse score response"
 
-    def _call_ollama(self, prompt: str) -> str:
-        """Call Ollama API."""
+    def _call_ollama(self, prompt: str, max_tokens: int = 2000) -> str:
+        """
+        Call Ollama API, reusing the stored response for a repeated prompt.
+
+        Both phases go through here. When the failures repeat, the
+        obfuscation prompt is the same, so its response is reused. That
+        response feeds the scoring prompt, so scoring is reused as well.
+        """
+        cache_key = self._cache_key(prompt)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+        result = self._request_ollama(prompt, max_tokens)
+        if result.strip():
+            self._cache_set(cache_key, result)
+        return result
+
+    def _cache_key(self, prompt: str) -> str:
+        """
+        Content hash of model and prompt, ignoring run-to-run noise.
+
+        Line numbers, addresses and directory paths in the prompt are
+        masked, so editing unrelated code still gives a cache hit.
+        """
+        canonical = f"{self.ollama_model}\0{VOLATILE_ERROR_DETAILS.sub('', prompt)}"
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired."""
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.txt"
+        try:
+            if time.time() - path.stat().st_mtime > CACHE_TTL_SECONDS:
+                return None
+            return path.read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def _cache_set(self, key: str, response: str) -> None:
+        """Store response under key. Cache write failures are not fatal."""
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            (self.cache_dir / f"{key}.txt").write_text(response, encoding="utf-8")
+        except OSError as e:
+            print(f"⚠️  Could not write response cache: {e}")
+
+    def _request_ollama(self, prompt: str, max_tokens: int) -> str:
+        """Send one generate request, generating at most max_tokens tokens."""
         payload = {
             "model": self.ollama_model,
             "prompt": prompt,
-            "stream": False,
+            "stream": self.stream,
             "options": {
                 "temperature": 0.3,
-                "num_predict": 2000
+                "num_predict": max_tokens
             }
         }
 
-        response = requests.post(
+        if self.stream:
+            return self._request_ollama_streaming(payload)
+
+        response = self._session.post(
             f"{self.ollama_url}/api/generate",
-            json=payload,
+            data=_json_dumps(payload),
+            headers={"Content-Type": "application/json"},
             timeout=20
         )
 
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
 
         result = data.get("response", "") or data.get("thinking", "")
         return result
 
+    def _request_ollama_streaming(self, payload: Dict[str, Any]) -> str:
+        """
+        Stream a generate request, stopping once the score JSON is complete.
+
+        Tokens are passed to on_token (if set) as they arrive. Leaving the
+        response early closes the connection, which makes Ollama stop
+        generating. The 20s read timeout applies between chunks.
+        """
+        response_parts = []
+        thinking_parts = []
+
+        with self._session.post(
+            f"{self.ollama_url}/api/generate",
+            data=_json_dumps(payload),
+            headers={"Content-Type": "application/json"},
+            stream=True,
+            timeout=(5, 20)
+        ) as response:
+            response.raise_for_status()
+
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = _json_loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
+
+                token = chunk.get("response", "")
+                if token:
+                    response_parts.append(token)
+                    if self.on_token:
+                        self.on_token(token)
+                    if "}" in token and _score_complete("".join(response_parts)):
+                        break
+                thinking_parts.append(chunk.get("thinking", ""))
+
+                if chunk.get("done"):
+                    break
+
+        return "".join(response_parts) or "".join(thinking_parts)
+
     def _format_perfect_result(self, summary: Dict) -> str:
         """Format output for perfect score case."""
         return f"""
@@ -377,18 +881,7 @@ Implementation is correct and ready for deployment.
     ) -> str:
         """Format output with satisfaction score."""
         # Determine score emoji and label
-        if score >= 0.9:
-            emoji = "🟢"
-            label = "Excellent"
-        elif score >= 0.7:
-            emoji = "🟡"
-            label = "Good"
-        elif score >= 0.4:
-            emoji = "🟠"
-            label = "Moderate"
-        else:
-            emoji = "🔴"
-            label = "Poor"
+        emoji, label = SCORE_BUCKETS[bisect.bisect_right(SCORE_THRESHOLDS, score)]
 
         header = f"""
 ================================================================================
@@ -419,38 +912,24 @@ BEHAVIORAL FEEDBACK:
             f"Implementation issues detected ({results['summary']['failed']} test(s) failed)\n"
         ]
 
-        patterns = {
-            "create_user": [],
-            "get_user": [],
-            "update_user": [],
-            "delete_user": []
-        }
+        # Dicts keep messages unique and in first-seen order
+        patterns = {category: {} for category in FALLBACK_CATEGORIES}
 
         for failure in failures:
-            scenario = failure['scenario']
-            error = failure.get("traces", {}).get("error_message", "")
-
-            if "create" in scenario.lower():
-                if "NotImplementedError" in str(error):
-                    patterns["create_user"].append("the create_user method is not implemented yet.")
-                elif "hash" in scenario.lower() or "password" in scenario.lower():
-                    patterns["create_user"].append("passwords need to be hashed, not stored in plaintext.")
-                elif "duplicate" in scenario.lower():
-                    patterns["create_user"].append("duplicate emails should be rejected.")
-                else:
-                    patterns["create_user"].append("user creation has issues.")
-            elif "fetch" in scenario.lower() or "get" in scenario.lower():
-                patterns["get_user"].append("user retrieval is not working correctly.")
-            elif "update" in scenario.lower():
-                patterns["update_user"].append("user updates are not functioning.")
-            elif "delete" in scenario.lower():
-                patterns["delete_user"].append("user deletion has issues.")
+            scenario = failure.scenario
+            error = str(failure.error_message)
+
+            for scenario_patterns, error_pattern, category, message in FALLBACK_RULES:
+                if error_pattern is not None and not error_pattern.search(error):
+                    continue
+                if all(pattern.search(scenario) for pattern in scenario_patterns):
+                    patterns[category][message] = None
+                    break
 
         for category, messages in patterns.items():
             if messages:
-                unique_messages = list(set(messages))
                 summary.append(f"{category.upper()}:")
-                for msg in unique_messages:
+                for msg in messages:
                     summary.append(f"  - {msg}")
 
         return "\n".join(summary)
@@ -464,18 +943,29 @@ def main():
     parser.add_argument("--code-dir", default="generated_code", help="Directory containing generated code")
     parser.add_argument("--test-dir", default="external_tests", help="Directory containing BDD tests")
     parser.add_argument("--ollama-url", default="http://localhost:11434", help="Ollama API URL")
-    parser.add_argument("--ollama-model", default="llama3.1", help="Ollama model to use")
+    parser.add_argument("--ollama-model", default="llama3.1", help="Ollama model to use; the task tolerates quantized tags (e.g. llama3.1:8b-instruct-q4_K_M)")
+    parser.add_argument("--cache-dir", default=".bdd_obfuscation_cache", help="Directory for cached Ollama responses")
+    parser.add_argument("--no-cache", action="store_true", help="Always call Ollama, ignoring cached responses")
+    parser.add_argument("--parallel", type=int, default=1, help="Number of behave processes to shard feature files across")
+    parser.add_argument("--in-process", action="store_true", help="Run behave inside the wrapper instead of a subprocess")
+    parser.add_argument("--no-stream", action="store_true", help="Wait for the full Ollama response instead of streaming")
+    parser.add_argument("--always-llm-score", action="store_true", help="Ask the LLM for a score even when the pass rate is clearly high or low")
 
     args = parser.parse_args()
 
-    wrapper = BDDObfuscationWrapperWithScoring(
+    with BDDObfuscationWrapperWithScoring(
         code_dir=args.code_dir,
         test_dir=args.test_dir,
         ollama_url=args.ollama_url,
-        ollama_model=args.ollama_model
-    )
-
-    feedback = wrapper.run_tests_with_scoring()
+        ollama_model=args.ollama_model,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        stream=not args.no_stream,
+        on_token=lambda token: print(token, end="", flush=True),
+        in_process=args.in_process,
+        parallel=args.parallel,
+        always_llm_score=args.always_llm_score
+    ) as wrapper:
+        feedback = wrapper.run_tests_with_scoring()
     print(feedback)
 
     return 0
@@ -8,11 +8,117 @@ Automatically discovers test locations, code locations, and LLM settings.
 
 import subprocess
 import json
-import requests
+import os
+import re
+import signal
 from pathlib import Path
-from typing import Dict, List, Any, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Any, Tuple, Optional
 import sys
-import toml
+from collections import Counter
+from functools import cached_property
+
+# requests and the TOML parser are imported where they're first used,
+# so `--help` and `--init` don't pay for them
+if TYPE_CHECKING:
+    import requests
+
+try:
+    import ijson
+except ImportError:  # optional: stream-parse behave results in constant memory
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # optional: faster JSON for behave results and LLM responses
+    orjson = None
+
+# Failures listed in the single obfuscation prompt; the rest are counted
+MAX_PROMPT_FAILURES = 20
+
+# The score JSON is ~50 tokens; cap generation and stop once it closes
+SCORE_NUM_PREDICT = 128
+SCORE_STOP = ["}\n"]
+
+# A run this close to passing is scored by its pass rate, without an LLM call
+CLEAR_PASS_MAX_FAILURES = 2
+
+# Fallback when the score response isn't valid JSON
+SCORE_FIELD = re.compile(r'"score"\s*:\s*(\d+\.?\d*)')
+
+# Banner line around the printed results
+SEPARATOR = "=" * 80
+
+# Written by --init
+DEFAULT_CONFIG = b"""# Spec-Driven Development Configuration
+
+[project]
+name = "my-project"
+version = "0.1.0"
+
+[paths]
+generated_code_dir = "generated_code"
+test_dir = "features"
+
+[test]
+runner = "behave"
+output_format = "json.pretty"
+output_file = "test_results.json"
+timeout = 30
+
+[llm]
+model = "llama3.1"
+url = "http://localhost:11434"
+timeout = 20
+stream = true
+
+[scoring]
+production_threshold = 0.95
+staging_threshold = 0.80
+dev_threshold = 0.70
+
+[wrapper]
+use_satisfaction_scoring = true
+"""
+
+
+def _extract_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced {...} span in text, or None if there isn't one.
+
+    Braces inside JSON strings are ignored, so reasoning text that
+    mentions "{" or "}" doesn't end the object early.
+    """
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
+
+
+def _json_loads(data) -> Any:
+    """Parse JSON bytes or text, with orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 class SpecDrivenConfig:
@@ -28,19 +134,25 @@ class SpecDrivenConfig:
             )
 
         self.config_path = Path(config_path)
-        self.config = toml.load(self.config_path)
+        try:
+            import tomllib
+        except ImportError:  # Python < 3.11
+            import tomli as tomllib
+
+        self.config = tomllib.loads(self.config_path.read_bytes().decode("utf-8"))
         self._validate()
 
     def _find_config_file(self) -> Optional[str]:
         """Search for .spec-driven.toml in current and parent directories."""
-        current = Path.cwd()
+        # Plain strings: this runs on every CLI start and needs no Path objects
+        current = os.getcwd()
 
         for _ in range(10):  # Search up to 10 directories up
-            config_file = current / ".spec-driven.toml"
-            if config_file.exists():
-                return str(config_file)
+            config_file = os.path.join(current, ".spec-driven.toml")
+            if os.path.isfile(config_file):
+                return config_file
 
-            parent = current.parent
+            parent = os.path.dirname(current)
             if parent == current:  # Reached root
                 break
             current = parent
@@ -77,34 +189,46 @@ class SpecDrivenConfig:
             if key not in self.config["scoring"]:
                 self.config["scoring"][key] = default
 
-    @property
+    @cached_property
     def generated_code_dir(self) -> Path:
         return Path(self.config["paths"]["generated_code_dir"])
 
-    @property
+    @cached_property
     def test_dir(self) -> Path:
         return Path(self.config["paths"]["test_dir"])
 
-    @property
+    @cached_property
     def test_runner(self) -> str:
         return self.config["test"]["runner"]
 
-    @property
+    @cached_property
+    def test_timeout(self) -> float:
+        return self.config["test"].get("timeout", 30)
+
+    @cached_property
     def llm_model(self) -> str:
         return self.config["llm"]["model"]
 
-    @property
+    @cached_property
     def llm_url(self) -> str:
         return self.config["llm"]["url"]
 
-    @property
+    @cached_property
+    def llm_stream(self) -> bool:
+        return self.config["llm"].get("stream", True)
+
+    @cached_property
     def use_satisfaction_scoring(self) -> bool:
         return self.config.get("wrapper", {}).get("use_satisfaction_scoring", True)
 
-    @property
+    @cached_property
     def production_threshold(self) -> float:
         return self.config["scoring"]["production_threshold"]
 
+    def __getitem__(self, section: str) -> Dict[str, Any]:
+        """Raw access to a config section, e.g. config["test"]."""
+        return self.config[section]
+
     def __repr__(self):
         return f"SpecDrivenConfig({self.config_path})"
 
@@ -125,6 +249,41 @@ class BDDWrapperV3:
             config = SpecDrivenConfig()
 
         self.config = config
+        self._session = None
+
+    def _get_session(self) -> "requests.Session":
+        """The HTTP session, created on the first LLM call."""
+        if self._session is None:
+            self._session = self._create_session()
+        return self._session
+
+    def _create_session(self) -> "requests.Session":
+        """
+        HTTP session reused for every LLM call, keeping the connection alive.
+
+        Two pooled connections cover the obfuscation and scoring calls.
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers["Connection"] = "keep-alive"
+        return session
+
+    def close(self):
+        """Close the pooled HTTP connections."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def run(self) -> str:
         """Main entry point - run tests and return scored feedback."""
@@ -153,8 +312,7 @@ class BDDWrapperV3:
         output_file = test_dir / self.config["test"]["output_file"]
 
         # Clean up
-        if output_file.exists():
-            output_file.unlink()
+        output_file.unlink(missing_ok=True)
 
         # Build command
         cmd = [
@@ -164,44 +322,85 @@ class BDDWrapperV3:
             f"--outfile={output_file}"
         ]
 
+        # behave runs in its own process group so a timeout also takes
+        # down anything the steps spawned
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True
+        )
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
+            process.communicate(timeout=self.config.test_timeout)
         except subprocess.TimeoutExpired:
+            self._kill_process_group(process)
             return {
                 "status": "timeout",
                 "summary": {"passed": 0, "failed": 0, "skipped": 0}
             }
 
         # Parse results
-        if output_file.exists():
-            with open(output_file, 'r') as f:
-                test_data = json.load(f)
-        else:
-            test_data = []
+        return self._parse_test_results(self._iter_features(output_file))
+
+    def _kill_process_group(self, process: subprocess.Popen):
+        """SIGTERM the process group, then SIGKILL it if it doesn't exit."""
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(process.pid, sig)
+            except ProcessLookupError:
+                break
+            try:
+                process.communicate(timeout=5)
+                break
+            except subprocess.TimeoutExpired:
+                continue
 
-        return self._parse_test_results(test_data)
+    def _iter_features(self, output_file: Path) -> Iterator[Dict]:
+        """
+        Yield features from behave's JSON results, in order.
 
-    def _parse_test_results(self, test_data: List[Dict]) -> Dict[str, Any]:
-        """ParseBehave JSON output."""
-        passed = 0
-        failed = 0
-        skipped = 0
+        With ijson installed, features are parsed one at a time so only
+        one feature is held in memory at once.
+        """
+        try:
+            if ijson is not None:
+                with open(output_file, "rb") as f:
+                    yield from ijson.items(f, "item")
+            else:
+                yield from _json_loads(output_file.read_bytes())
+        except FileNotFoundError:
+            # behave didn't write results (e.g. it failed to start)
+            return
+
+    def _parse_test_results(self, test_data: Iterable[Dict]) -> Dict[str, Any]:
+        """
+        Parse Behave JSON output, one feature at a time.
+
+        Only counts and a compact record per failed scenario are kept,
+        so the parsed features can be released as soon as they are read.
+        """
+        statuses = Counter()
+        failures = []
 
         for feature in test_data:
-            for scenario in feature.get("elements", []):
+            for scenario in feature.get("elements", ()):
                 status = scenario.get("status", "unknown")
-
-                if status == "passed":
-                    passed += 1
-                elif status in ("failed", "error"):
-                    failed += 1
-                elif status == "skipped":
-                    skipped += 1
+                statuses[status] += 1
+
+                if status in ("failed", "error", "hook_error"):
+                    step, error = self._failed_step(scenario)
+                    failures.append({
+                        "feature": feature.get("name", "Unknown Feature"),
+                        "scenario": scenario.get("name", "Unknown Scenario"),
+                        "step": step,
+                        "error": error
+                    })
+
+        passed = statuses["passed"]
+        # A hook_error scenario never ran its steps, so it can't pass
+        failed = statuses["failed"] + statuses["error"] + statuses["hook_error"]
+        skipped = statuses["skipped"]
 
         summary = {
             "passed": passed,
@@ -213,9 +412,21 @@ class BDDWrapperV3:
         return {
             "status": "passed" if failed == 0 else "failed",
             "summary": summary,
-            "test_data": test_data
+            "failures": failures
         }
 
+    def _failed_step(self, scenario: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """The first failed step of a scenario and its error message."""
+        for step in scenario.get("steps", []):
+            result = step.get("result", {})
+            if result.get("status") in ("failed", "error"):
+                error = result.get("error_message")
+                # json.pretty splits long messages into a list of lines
+                if isinstance(error, list):
+                    error = "\n".join(error)
+                return f"{step.get('keyword', '')} {step.get('name', '')}".strip(), error
+        return None, None
+
     def _run_with_scoring(self, raw_results: Dict) -> str:
         """Run with satisfaction scoring."""
         summary = raw_results["summary"]
@@ -230,8 +441,14 @@ class BDDWrapperV3:
         behavioral_feedback = self._obfuscate(raw_results)
 
         # Phase 2: Scoring
-        print("📈 Phase 2: Evaluating satisfaction score...")
-        score, reasoning = self._evaluate_satisfaction(raw_results, behavioral_feedback)
+        pass_rate = self._pass_rate(summary)
+        if summary["failed"] <= CLEAR_PASS_MAX_FAILURES and pass_rate >= self.config.production_threshold:
+            # Already at the production threshold with only a couple of failures
+            score = pass_rate
+            reasoning = f"{pass_rate:.1%} of scenarios passed with {summary['failed']} failing; scored by pass rate."
+        else:
+            print("📈 Phase 2: Evaluating satisfaction score...")
+            score, reasoning = self._evaluate_satisfaction(raw_results, behavioral_feedback)
 
         # Check deployment threshold
         deploy_ready = score >= self.config.production_threshold
@@ -251,13 +468,13 @@ class BDDWrapperV3:
         feedback = self._obfuscate(raw_results)
 
         return f"""
-================================================================================
+{SEPARATOR}
 Test Results: {summary['failed']} failed
-================================================================================
+{SEPARATOR}
 
 {feedback}
 
-================================================================================
+{SEPARATOR}
 """
 
     def _obfuscate(self, raw_results: Dict) -> str:
@@ -274,7 +491,7 @@ Test Results: {summary['failed']} failed
     def _evaluate_satisfaction(self, raw_results: Dict, feedback: str) -> Tuple[float, str]:
         """Evaluate satisfaction score."""
         summary = raw_results["summary"]
-        pass_rate = summary["passed"] / summary["total"] if summary["total"] > 0 else 0
+        pass_rate = self._pass_rate(summary)
 
         prompt = f"""
 Evaluate satisfaction score (0.0-1.0) for this implementation:
@@ -296,76 +513,169 @@ Return JSON:
 """
 
         try:
-            response = self._call_llm(prompt)
+            response = self._call_llm(
+                prompt,
+                num_predict=SCORE_NUM_PREDICT,
+                stop=SCORE_STOP,
+                stop_after_json=True
+            )
             return self._parse_score(response)
         except Exception as e:
             return pass_rate, f"Used pass rate as fallback: {e}"
 
-    def _call_llm(self, prompt: str) -> str:
-        """Call LLM for obfuscation or scoring."""
+    def _pass_rate(self, summary: Dict) -> float:
+        """Fraction of scenarios that passed."""
+        return summary["passed"] / summary["total"] if summary["total"] > 0 else 0
+
+    def _call_llm(
+        self,
+        prompt: str,
+        num_predict: int = 2000,
+        stop: Optional[List[str]] = None,
+        stop_after_json: bool = False
+    ) -> str:
+        """
+        Call LLM for obfuscation or scoring.
+
+        With stop_after_json, a streamed response is cut off as soon as
+        it contains a complete JSON object, so the model doesn't keep
+        generating after the score.
+        """
         timeout = self.config["llm"].get("timeout", 20)
+        stream = self.config.llm_stream
+
+        options = {
+            "temperature": 0.3,
+            "num_predict": num_predict
+        }
+        if stop:
+            options["stop"] = stop
 
         payload = {
             "model": self.config.llm_model,
             "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.3,
-                "num_predict": 2000
-            }
+            "stream": stream,
+            "options": options
         }
 
-        response = requests.post(
+        if stream:
+            text = self._call_llm_streaming(payload, timeout, stop_after_json)
+        else:
+            response = self._get_session().post(
+                f"{self.config.llm_url}/api/generate",
+                json=payload,
+                timeout=timeout
+            )
+
+            response.raise_for_status()
+            data = _json_loads(response.content)
+
+            text = data.get("response", "") or data.get("thinking", "")
+
+        # Ollama drops the stop sequence from the output, so a stop that
+        # fired on "}\n" leaves the JSON object one brace short
+        if stop and "{" in text and _extract_json_object(text) is None:
+            text = text.rstrip() + "}"
+
+        return text
+
+    def _call_llm_streaming(self, payload: Dict[str, Any], timeout: float, stop_after_json: bool) -> str:
+        """
+        Collect a streamed response, one JSON chunk per line.
+
+        The timeout applies between chunks, not to the whole generation.
+        Leaving the response early closes the connection, which makes
+        Ollama stop generating.
+        """
+        response_parts = []
+        thinking_parts = []
+
+        with self._get_session().post(
             f"{self.config.llm_url}/api/generate",
             json=payload,
+            stream=True,
             timeout=timeout
-        )
+        ) as response:
+            response.raise_for_status()
 
-        response.raise_for_status()
-        data = response.json()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = _json_loads(line)
+                if "error" in chunk:
+                    raise RuntimeError(chunk["error"])
 
-        return data.get("response", "") or data.get("thinking", "")
+                token = chunk.get("response", "")
+                if token:
+                    response_parts.append(token)
+                    if stop_after_json and "}" in token and _extract_json_object("".join(response_parts)):
+                        break
+                thinking_parts.append(chunk.get("thinking", ""))
+
+                if chunk.get("done"):
+                    break
+
+        return "".join(response_parts) or "".join(thinking_parts)
 
     def _parse_score(self, response: str) -> Tuple[float, str]:
         """Parse score from LLM response."""
         try:
-            data = json.loads(response)
+            data = _json_loads(response)
             return float(data["score"]), data.get("reasoning", "")
         except json.JSONDecodeError:
             # Try to extract score with regex
-            import re
-            match = re.search(r'"score"\s*:\s*(\d+\.?\d*)', response)
+            match = SCORE_FIELD.search(response)
             if match:
                 return float(match.group(1)), response[:200]
 
         return 0.0, "Failed to parse score"
 
     def _build_obfuscation_prompt(self, raw_results: Dict) -> str:
-        """Build obfuscation prompt from test results."""
-        return """
+        """
+        Build one obfuscation prompt covering every failure.
+
+        Failures are numbered so the model answers with a matching
+        numbered list in a single call, instead of one call per failure.
+        """
+        failures = raw_results.get("failures", [])
+
+        parts = ["""
 You are translating test failures into behavioral feedback for an AI developer.
 - HIDE: File names, line numbers, function names
 - SHOW: What behavior failed, what was expected vs. actual
 - BE CONCISE: 1-3 sentences per failure
 
 Test failures to translate:
-(Implementation would add specific failures here)
-
-Return ONLY behavioral feedback as a numbered list.
-"""
+"""]
+        for i, failure in enumerate(failures[:MAX_PROMPT_FAILURES], 1):
+            parts.append(f"{i}. Feature: {failure['feature']} / Scenario: {failure['scenario']}\n")
+            if failure["step"]:
+                parts.append(f"   Failed Step: {failure['step']}\n")
+            if failure["error"]:
+                parts.append(f"   Error: {failure['error']}\n")
+
+        if len(failures) > MAX_PROMPT_FAILURES:
+            parts.append(f"... and {len(failures) - MAX_PROMPT_FAILURES} more failures\n")
+
+        count = min(len(failures), MAX_PROMPT_FAILURES)
+        parts.append(f"""
+Return ONLY behavioral feedback as a numbered list with exactly {count} items,
+one per failure above, in the same order.
+""")
+        return "".join(parts)
 
     def _format_perfect_result(self, summary: Dict) -> str:
         """Format result when all tests pass."""
         return f"""
-================================================================================
+{SEPARATOR}
 🟢 ALL TESTS PASSED - Satisfaction: 1.00/1.00
-================================================================================
+{SEPARATOR}
 
 ✅ All {summary['passed']} scenarios passed successfully!
 
 Deployment status: ✅ READY (>= {self.config.production_threshold:.0%})
 
-================================================================================
+{SEPARATOR}
 """
 
     def _format_scored_result(
@@ -380,9 +690,9 @@ Deployment status: ✅ READY (>= {self.config.production_threshold:.0%})
         status = "READY" if deploy_ready else f"NEEDS WORK (< {self.config.production_threshold:.0%})"
 
         return f"""
-================================================================================
+{SEPARATOR}
 {'🟢' if deploy_ready else '🔴'} TEST RESULTS - Satisfaction: {score:.2f}/1.00 ({status})
-================================================================================
+{SEPARATOR}
 
 Summary: {summary['passed']} passed, {summary['failed']} failed, {summary['skipped']} skipped
 
@@ -391,12 +701,12 @@ Reasoning:
 
 Deployment status: {'✅ Ready for production' if deploy_ready else f'❌ Not ready (need {self.config.production_threshold:.0%} to deploy)'}
 
-================================================================================
+{SEPARATOR}
 
 BEHAVIORAL FEEDBACK:
 {feedback}
 
-================================================================================
+{SEPARATOR}
 """
 
 
@@ -421,37 +731,7 @@ def main():
     args = parser.parse_args()
 
     if args.init:
-        # Create example config
-        config_template = """# Spec-Driven Development Configuration
-
-[project]
-name = "my-project"
-version = "0.1.0"
-
-[paths]
-generated_code_dir = "generated_code"
-test_dir = "features"
-
-[test]
-runner = "behave"
-output_format = "json.pretty"
-output_file = "test_results.json"
-
-[llm]
-model = "llama3.1"
-url = "http://localhost:11434"
-timeout = 20
-
-[scoring]
-production_threshold = 0.95
-staging_threshold = 0.80
-dev_threshold = 0.70
-
-[wrapper]
-use_satisfaction_scoring = true
-"""
-        with open(".spec-driven.toml", "w") as f:
-            f.write(config_template)
+        Path(".spec-driven.toml").write_bytes(DEFAULT_CONFIG)
 
         print("✅ Created .spec-driven.toml")
         print("Edit the configuration for your project, then run:")
@@ -461,8 +741,8 @@ use_satisfaction_scoring = true
     # Load config and run
     try:
         config = SpecDrivenConfig(args.config)
-        wrapper = BDDWrapperV3(config)
-        result = wrapper.run()
+        with BDDWrapperV3(config) as wrapper:
+            result = wrapper.run()
         print(result)
         return 0
     except Exception as e: